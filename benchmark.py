@@ -0,0 +1,204 @@
+import argparse
+import json
+import sys
+import time
+import timeit
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+import blocks
+import emulator
+import headless
+import library
+import memory
+import screen
+import settings
+
+
+def list_roms():
+    rom_library = library.default_library()
+    return [(entry.id, rom_library.read(entry)) for entry in rom_library.entries]
+
+
+def peak_rss():
+    # kilobytes on Linux, None where it can't be measured
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_rom_benchmark(name, data, cycles, key_events, chip_emulator, engine):
+    chip_emulator.reset()
+    chip_emulator.seed(0)
+    chip_emulator.load_rom(data)
+    # fast-forwarded idle loops and FX0A waiting would be counted as executed
+    # instructions, so every instruction is really executed
+    chip_emulator.skip_idle_loops = False
+    block_engine = None
+    if engine == "blocks":
+        block_engine = blocks.BlockEngine(chip_emulator)
+
+    instructions_per_frame = chip_emulator.cycles_per_timer_tick
+    events = list(key_events)
+    event_index = 0
+    frame = 0
+    start_time = time.perf_counter()
+    while chip_emulator.cycles < cycles:
+        while event_index < len(events) and events[event_index][0] <= frame:
+            _, key, is_pressed = events[event_index]
+            if is_pressed:
+                chip_emulator.press_button(key)
+            else:
+                chip_emulator.release_button(key)
+            event_index += 1
+        if block_engine is not None:
+            block_engine.run_cycles(instructions_per_frame)
+        else:
+            chip_emulator.run_cycles(instructions_per_frame)
+        frame += 1
+    seconds = time.perf_counter() - start_time
+
+    if block_engine is not None:
+        block_engine.detach()
+    return {
+        "instructions_per_second": chip_emulator.cycles / seconds,
+        "frames_per_second": frame / seconds,
+        "seconds": seconds
+    }
+
+
+def run_micro_benchmarks(number):
+    chip_emulator = emulator.Emulator()
+    chip_screen = screen.Screen()
+    packed_screen = screen.PackedScreen()
+    chip_memory = memory.Memory()
+    sprite = bytearray([0xf0, 0x90, 0xf0, 0x90, 0xf0])
+    data = bytes(range(256))
+
+    cases = {
+        "Emulator.parse_word": lambda: emulator.Emulator.parse_word(0xd125),
+        "Emulator.make_tact": chip_emulator.make_tact,
+        "Emulator.reset": chip_emulator.reset,
+        "Emulator.restart": chip_emulator.restart,
+        "Emulator.save_state": chip_emulator.save_state,
+        "Screen.draw_sprite": lambda: chip_screen.draw_sprite(10, 10, sprite),
+        "PackedScreen.draw_sprite": lambda: packed_screen.draw_sprite(10, 10, sprite),
+        "Screen.decode_byte_to_pixels": lambda: screen.Screen.decode_byte_to_pixels(0xa5),
+        "Memory.load_data": lambda: chip_memory.load_data(0x300, data),
+        "Memory.read": lambda: chip_memory.read(0x300, 15),
+        "Memory.view": lambda: chip_memory.view(0x300, 15),
+    }
+    chip_emulator.load_rom(bytes([0x70, 0x01, 0x12, 0x00]))
+
+    results = {}
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=number, repeat=3))
+        results[name] = {"calls_per_second": number / seconds}
+    return results
+
+
+def run_suite(cycles=settings.instructions_per_frame * 600, key_script="30:+5,60:-5,90:+4,120:-4",
+              micro_number=10000, engine="interpreter", only=None):
+    key_events = headless.parse_key_script(key_script)
+    chip_emulator = emulator.Emulator()
+    roms = {}
+    for name, data in list_roms():
+        if only and not any(part in name for part in only):
+            continue
+        try:
+            roms[name] = run_rom_benchmark(name, data, cycles, key_events, chip_emulator, engine)
+        except (emulator.ImpossibleOperationException, memory.IncorrectAddressException,
+                memory.MemoryOverflowException, IndexError) as e:
+            roms[name] = {"error": repr(e)}
+
+    return {
+        "cycles": cycles,
+        "key_script": key_script,
+        "engine": engine,
+        "python": sys.version.split()[0],
+        "roms": roms,
+        "micro": run_micro_benchmarks(micro_number) if micro_number else {},
+        "peak_rss_kb": peak_rss()
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    regressions = []
+    for group, metric in [("roms", "instructions_per_second"),
+                          ("micro", "calls_per_second")]:
+        for name, result in current.get(group, {}).items():
+            expected = baseline.get(group, {}).get(name)
+            if expected is None or metric not in expected or metric not in result:
+                continue
+            ratio = result[metric] / expected[metric]
+            if ratio < 1 - threshold:
+                regressions.append((group, name, expected[metric], result[metric], ratio))
+    return regressions
+
+
+def format_suite(results):
+    lines = ["{:<28} {:>14} {:>10}".format("ROM", "instr/s", "frames/s")]
+    for name, result in results["roms"].items():
+        if "error" in result:
+            lines.append("{:<28} {}".format(name, result["error"]))
+            continue
+        lines.append("{:<28} {:>14.0f} {:>10.0f}".format(
+            name, result["instructions_per_second"], result["frames_per_second"]))
+    if results["micro"]:
+        lines.append("")
+        lines.append("{:<28} {:>14}".format("function", "calls/s"))
+        for name, result in results["micro"].items():
+            lines.append("{:<28} {:>14.0f}".format(name, result["calls_per_second"]))
+    if results["peak_rss_kb"] is not None:
+        lines.append("")
+        lines.append("peak RSS: {} KB".format(results["peak_rss_kb"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CHIP-8 emulator on bundled ROMs")
+    parser.add_argument("-c", "--cycles", type=int, default=settings.instructions_per_frame * 600,
+                        help="instructions per ROM")
+    parser.add_argument("-k", "--keys", default="30:+5,60:-5,90:+4,120:-4",
+                        help="key script: 'frame:+key,frame:-key'")
+    parser.add_argument("--engine", choices=["interpreter", "blocks"], default="interpreter")
+    parser.add_argument("--micro-number", type=int, default=10000,
+                        help="calls per micro benchmark, 0 to skip them")
+    parser.add_argument("--only", nargs="*", help="run only ROMs containing these names")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown against baseline, 0.1 is 10%%")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_suite(args.cycles, args.keys, args.micro_number, args.engine, args.only)
+    except headless.IncorrectKeyScriptException as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(format_suite(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        print("")
+        for group, name, expected, actual, ratio in regressions:
+            print("REGRESSION {}/{}: {:.0f} -> {:.0f} ({:.0%})".format(
+                group, name, expected, actual, ratio))
+        if regressions:
+            return 2
+        print("No regressions against {}".format(args.baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import bisect
+
+import emulator
+
+
+class BlockEngine:
+
+    def __init__(self, parent_emulator, max_block_length=64):
+        self.emulator = parent_emulator
+        self.max_block_length = max_block_length
+
+        # start address -> compiled block function
+        self.blocks = {}
+        # sorted start addresses of compiled blocks and start -> end address
+        self._starts = []
+        self._ends = {}
+        # straight instructions and the terminator
+        self._max_block_size = 2 * (max_block_length + 1)
+
+        self.emulator.memory.write_listeners.append(self.invalidate)
+
+    def detach(self):
+        self.emulator.memory.write_listeners.remove(self.invalidate)
+        self.blocks.clear()
+        self._starts.clear()
+        self._ends.clear()
+
+    def invalidate(self, start_address, length):
+        if not self._starts:
+            return
+        end_address = start_address + length
+        # only blocks starting at most one block size before the range can cover it
+        low = bisect.bisect_left(self._starts, start_address - self._max_block_size + 1)
+        high = bisect.bisect_left(self._starts, end_address)
+        kept = []
+        for start in self._starts[low:high]:
+            if self._ends[start] > start_address:
+                del self.blocks[start]
+                del self._ends[start]
+            else:
+                kept.append(start)
+        self._starts[low:high] = kept
+
+    def step(self):
+        block = self.blocks.get(self.emulator.memory_pointer)
+        if block is None:
+            block = self._compile(self.emulator.memory_pointer)
+        return block(self.emulator)
+
+    def run(self, cycles):
+        executed = 0
+        blocks = self.blocks
+        chip_emulator = self.emulator
+        while executed < cycles:
+            block = blocks.get(chip_emulator.memory_pointer)
+            if block is None:
+                block = self._compile(chip_emulator.memory_pointer)
+            executed += block(chip_emulator)
+        return executed
+
+    def run_cycles(self, count):
+        chip_emulator = self.emulator
+        end = chip_emulator.cycles + count
+        executed = 0
+        while chip_emulator.cycles < end:
+            # timers are ticked between blocks, so a tick can be late
+            # for the length of one block
+            chunk = self.run(min(end, chip_emulator._next_timer_cycle) - chip_emulator.cycles)
+            chip_emulator.advance_cycles(chunk)
+            executed += chunk
+            if chip_emulator.is_waiting_for_key and chip_emulator.skip_idle_loops and \
+                    chip_emulator.cycles < end:
+                # nothing but timers changes until a key is pressed
+                executed += end - chip_emulator.cycles
+                chip_emulator.advance_cycles(end - chip_emulator.cycles)
+        return executed
+
+    def _compile(self, start_address):
+        generator = _BlockGenerator(self.emulator, start_address, self.max_block_length)
+        source, end_address = generator.generate()
+
+        namespace = {}
+        exec(compile(source, '<block 0x{:03x}>'.format(start_address), 'exec'), namespace)
+        block = namespace['block']
+
+        if start_address not in self._ends:
+            bisect.insort(self._starts, start_address)
+        self.blocks[start_address] = block
+        self._ends[start_address] = end_address
+        return block
+
+
+class _BlockGenerator:
+    # opcodes which are not changing memory pointer and memory
+    _straight_opcodes = {
+        0x0, 0x00E0, 0x6, 0x7, 0xA, 0xC,
+        0x8000, 0x8001, 0x8002, 0x8003, 0x8004, 0x8005, 0x8006, 0x8007, 0x800e,
+        0xF007, 0xF015, 0xF018, 0xF01E, 0xF029, 0xF065
+    }
+    _skip_conditions = {
+        0x3: 'v{0:x} == {1}',
+        0x4: 'v{0:x} != {1}',
+        0x5000: 'v{0:x} == v{1:x}',
+        0x9000: 'v{0:x} != v{1:x}'
+    }
+
+    def __init__(self, parent_emulator, start_address, max_block_length):
+        self.emulator = parent_emulator
+        self.start_address = start_address
+        self.max_block_length = max_block_length
+
+        self.body = []
+        self.used_registers = set()
+        self.changed_registers = set()
+        self.is_i_used = False
+        self.is_i_changed = False
+
+    def generate(self):
+        memory = self.emulator.memory
+        address = self.start_address
+        count = 0
+        terminator = []
+
+        while True:
+            if address + 1 >= memory.memory_size:
+                if count:
+                    # the word can't be read, so the block ends before it and
+                    # the next step fails in interpreter
+                    terminator = ['emu.memory_pointer = {}'.format(address)]
+                else:
+                    terminator = self._interpret(address)
+                    count = 1
+                    address += 2
+                break
+            word = memory.read_opcode(address)
+            opcode, args = emulator.Emulator.parse_word(word)
+
+            if opcode in self._straight_opcodes and count < self.max_block_length:
+                self._emit(opcode, args)
+                count += 1
+                address += 2
+                continue
+
+            if opcode == 0x1:
+                terminator = ['emu.memory_pointer = {}'.format(args[0]),
+                              'emu.is_need_to_draw = False']
+            elif opcode in self._skip_conditions:
+                self._use(*(args if opcode >> 12 in (0x5, 0x9) else args[:1]))
+                condition = self._skip_conditions[opcode].format(*args)
+                terminator = ['emu.memory_pointer = {} if {} else {}'.format(
+                                  address + 4, condition, address + 2),
+                              'emu.is_need_to_draw = False']
+            else:
+                # other commands are executed by interpreter
+                terminator = self._interpret(address)
+            count += 1
+            address += 2
+            break
+
+        lines = ['def block(emu):']
+        if self.used_registers or self.changed_registers:
+            lines.append('    regs = emu.registers')
+        for register in sorted(self.used_registers):
+            lines.append('    v{0:x} = regs[{0}]'.format(register))
+        if self.is_i_used:
+            lines.append('    ri = emu.register_i')
+        lines.extend('    ' + line for line in self.body)
+        for register in sorted(self.changed_registers):
+            lines.append('    regs[{0}] = v{0:x}'.format(register))
+        if self.is_i_changed:
+            lines.append('    emu.register_i = ri')
+        lines.extend('    ' + line for line in terminator)
+        lines.append('    return {}'.format(count))
+
+        return '\n'.join(lines) + '\n', address
+
+    @staticmethod
+    def _interpret(address):
+        return ['emu.memory_pointer = {}'.format(address),
+                'emu.make_tact()']
+
+    def _use(self, *registers):
+        self.used_registers.update(registers)
+
+    def _change(self, *registers):
+        self.used_registers.update(registers)
+        self.changed_registers.update(registers)
+
+    def _emit(self, opcode, args):
+        body = self.body
+        if opcode == 0x0:
+            return
+        if opcode == 0x00E0:
+            body.append('emu.screen.reset()')
+        elif opcode == 0x6:
+            self._change(args[0])
+            body.append('v{0:x} = {1}'.format(*args))
+        elif opcode == 0x7:
+            self._change(args[0])
+            body.append('v{0:x} = (v{0:x} + {1}) & 0xFF'.format(*args))
+        elif opcode == 0xA:
+            self.is_i_used = self.is_i_changed = True
+            body.append('ri = {}'.format(args[0]))
+        elif opcode == 0xC:
+            self._change(args[0])
+            body.append('v{0:x} = emu.random.randint(0, 0xFF) & {1}'.format(*args))
+        elif opcode >> 12 == 0x8:
+            self._emit_arithmetic(opcode, *args)
+        elif opcode == 0xF007:
+            self._change(args[0])
+            body.append('v{0:x} = emu.delay_timer'.format(*args))
+        elif opcode == 0xF015:
+            self._use(args[0])
+            body.append('emu.delay_timer = v{0:x}'.format(*args))
+        elif opcode == 0xF018:
+            self._use(args[0])
+            body.append('emu.sound_timer = v{0:x}'.format(*args))
+        elif opcode == 0xF01E:
+            self._use(args[0])
+            self._change(0xF)
+            self.is_i_used = self.is_i_changed = True
+            body.append('value = ri + v{0:x}'.format(*args))
+            body.append('ri = value % 4096')
+            body.append('vf = value // 4096')
+        elif opcode == 0xF029:
+            self._use(args[0])
+            self.is_i_used = self.is_i_changed = True
+            body.append('ri = v{0:x} * 5'.format(*args))
+        elif opcode == 0xF065:
+            x = args[0]
+            self._change(*range(x + 1))
+            self.is_i_used = True
+            body.append('data = emu.memory.view(ri, {})'.format(x + 1))
+            for i in range(x + 1):
+                body.append('v{0:x} = data[{0}]'.format(i))
+
+    def _emit_arithmetic(self, opcode, x, y):
+        self._use(y)
+        self._change(x)
+        body = self.body
+        kind = opcode & 0xF
+        if kind == 0x0:
+            body.append('v{0:x} = v{1:x}'.format(x, y))
+        elif kind == 0x1:
+            body.append('v{0:x} |= v{1:x}'.format(x, y))
+        elif kind == 0x2:
+            body.append('v{0:x} &= v{1:x}'.format(x, y))
+        elif kind == 0x3:
+            body.append('v{0:x} ^= v{1:x}'.format(x, y))
+        else:
+            self._change(0xF)
+            if kind == 0x4:
+                body.append('value = v{0:x} + v{1:x}'.format(x, y))
+                body.append('vf = value >> 8')
+                body.append('v{0:x} = value & 0xFF'.format(x))
+            elif kind == 0x5:
+                body.append('value = v{0:x} - v{1:x}'.format(x, y))
+                body.append('vf = 1 if value >= 0 else 0')
+                body.append('v{0:x} = value & 0xFF'.format(x))
+            elif kind == 0x6:
+                body.append('vf = v{0:x} & 0b1'.format(x))
+                body.append('v{0:x} = v{0:x} >> 1'.format(x))
+            elif kind == 0x7:
+                body.append('value = v{1:x} - v{0:x}'.format(x, y))
+                body.append('v{0:x} = value & 0xFF'.format(x))
+                body.append('vf = 0 if value < 0 else 1')
+            elif kind == 0xE:
+                body.append('vf = (v{0:x} & 0x80) >> 7'.format(x))
+                body.append('v{0:x} = (v{0:x} << 1) & 0xFF'.format(x))
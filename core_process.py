@@ -0,0 +1,269 @@
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+import emulator
+import scheduler
+import settings
+
+
+class CoreProcessException(Exception):
+    """Ошибка при выполнении команды в процессе эмулятора"""
+    pass
+
+
+# frames counter, published slot, failure flag, count of written key events;
+# then ring of key events (key | 0x80 if pressed) and two framebuffer slots
+_header = struct.Struct('<IBBxxI')
+_events_size = settings.keypad_queue_size
+_frame_size = 64 * 32
+_shared_size = _header.size + _events_size + 2 * _frame_size
+
+
+def _slot_offset(slot):
+    return _header.size + _events_size + slot * _frame_size
+
+
+def _run_core(memory_name, connection, instructions_per_frame):
+    shared = shared_memory.SharedMemory(name=memory_name)
+    try:
+        _CoreLoop(shared.buf, connection, instructions_per_frame).run()
+    finally:
+        shared.close()
+
+
+class _CoreLoop:
+    def __init__(self, buffer, connection, instructions_per_frame):
+        self.buffer = buffer
+        self.connection = connection
+        self.emulator = emulator.Emulator(cycles_per_timer_tick=instructions_per_frame)
+        self.scheduler = scheduler.FrameScheduler(self.emulator, instructions_per_frame)
+        self.is_paused = True
+        self.is_running = True
+        self.events_read = 0
+        self.frames = 0
+        self.slot = 0
+        # description of the error which stopped emulation, taken by the parent
+        self.error = None
+
+    def run(self):
+        while self.is_running:
+            # paused core sleeps until the next command
+            while self.is_running and self.connection.poll(None if self.is_paused else 0):
+                self._execute(self.connection.recv())
+            if not self.is_running:
+                break
+            if self.is_paused:
+                continue
+
+            self._read_keys()
+            try:
+                self.scheduler.run_frame()
+            except Exception as e:
+                # a broken ROM pauses the core instead of killing it
+                self.is_paused = True
+                self._fail(e)
+            self._publish()
+            self.scheduler.wait_next_frame()
+
+    def _read_keys(self):
+        written = _header.unpack_from(self.buffer)[3]
+        pending = (written - self.events_read) & 0xFFFFFFFF
+        if pending > _events_size:
+            # the oldest events were overwritten; a lost release must not leave
+            # a key held, so held keys are released before the kept events
+            keypad = self.emulator.keypad
+            for key in range(keypad.keys_count):
+                if keypad.state >> key & 1:
+                    keypad.release(key)
+            self.events_read = (written - _events_size) & 0xFFFFFFFF
+            pending = _events_size
+        for _ in range(pending):
+            event = self.buffer[_header.size + self.events_read % _events_size]
+            self.emulator.keypad.push(event & 0xF, bool(event & 0x80))
+            self.events_read = (self.events_read + 1) & 0xFFFFFFFF
+        self.emulator.keypad.drain()
+
+    def _fail(self, error):
+        self.error = "{}: {}".format(type(error).__name__, error)
+        struct.pack_into('<B', self.buffer, 5, 1)
+
+    def _publish(self):
+        chip_screen = self.emulator.screen
+        if chip_screen.frames_published == self.frames:
+            return
+        self.frames = chip_screen.frames_published
+
+        # the frame is written to the slot which is not read now, then slots are swapped
+        self.slot = 1 - self.slot
+        offset = _slot_offset(self.slot)
+        self.buffer[offset:offset + _frame_size] = chip_screen.front
+        counter = _header.unpack_from(self.buffer)[0]
+        struct.pack_into('<B', self.buffer, 4, self.slot)
+        struct.pack_into('<I', self.buffer, 0, (counter + 1) & 0xFFFFFFFF)
+
+    def _execute(self, command):
+        name, args = command[0], command[1:]
+        try:
+            result = None
+            if name == "load":
+                self.emulator.reset()
+                self.emulator.load_rom(args[0])
+                self.emulator.screen.publish()
+            elif name == "reset":
+                self.emulator.restart()
+                self.emulator.screen.publish()
+            elif name == "pause":
+                self.is_paused = args[0]
+                self.scheduler.reset_pacing()
+            elif name == "save_state":
+                result = self.emulator.save_state()
+            elif name == "load_state":
+                self.emulator.load_state(args[0])
+                self.emulator.screen.publish()
+            elif name == "take_error":
+                result, self.error = self.error, None
+                struct.pack_into('<B', self.buffer, 5, 0)
+            elif name == "quit":
+                self.is_running = False
+            else:
+                raise CoreProcessException("Unknown command {}".format(name))
+            self._publish()
+            self.connection.send(("ok", result))
+        except Exception as e:
+            self.connection.send(("error", "{}: {}".format(type(e).__name__, e)))
+
+
+class SharedScreen:
+    # read side of the shared framebuffer, used as screen data by GUI
+    def __init__(self, buffer):
+        self.width = 64
+        self.height = 32
+        self.size = _frame_size
+        self._buffer = buffer
+        self._taken_counter = None
+
+    @property
+    def frames_published(self):
+        return _header.unpack_from(self._buffer)[0]
+
+    @property
+    def front(self):
+        # a view of the published slot without copying; the core writes the
+        # other slot next, so the view stays valid until two more frames
+        # are published, as the front buffer of Screen
+        while True:
+            counter, slot = _header.unpack_from(self._buffer)[:2]
+            offset = _slot_offset(slot)
+            frame = self._buffer[offset:offset + _frame_size]
+            # the slot and the counter are published together, a changed
+            # counter means the slot could be read in the middle of a swap
+            if self.frames_published == counter:
+                return frame
+
+    def take_dirty_regions(self):
+        counter = self.frames_published
+        if counter == self._taken_counter:
+            return []
+        self._taken_counter = counter
+        return [(0, 0, self.width, self.height)]
+
+
+class CoreProcess:
+    def __init__(self, instructions_per_frame=settings.instructions_per_frame):
+        self._shared = shared_memory.SharedMemory(create=True, size=_shared_size)
+        self._shared.buf[:_shared_size] = bytes(_shared_size)
+        self.screen = SharedScreen(self._shared.buf)
+        self.keys = 0
+        self._events_written = 0
+
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_run_core, args=(self._shared.name, child_connection, instructions_per_frame),
+            daemon=True)
+        self._process.start()
+        child_connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _call(self, *command):
+        try:
+            self._connection.send(command)
+            status, result = self._connection.recv()
+        except (EOFError, OSError) as e:
+            raise CoreProcessException("Emulator process is not running ({})".format(
+                type(e).__name__))
+        if status != "ok":
+            raise CoreProcessException(result)
+        return result
+
+    def load_rom(self, data):
+        self._call("load", bytes(data))
+
+    def reset(self):
+        self._call("reset")
+
+    def pause(self, is_paused=True):
+        self._call("pause", is_paused)
+
+    def save_state(self):
+        return self._call("save_state")
+
+    def load_state(self, state):
+        self._call("load_state", bytes(state))
+
+    def take_error(self):
+        # the error which paused emulation, or None
+        if not _header.unpack_from(self._shared.buf)[2]:
+            return None
+        return self._call("take_error")
+
+    def press_button(self, key):
+        if not self.keys >> key & 1:
+            self.keys |= 1 << key
+            self._push_key(key, True)
+
+    def release_button(self, key):
+        if self.keys >> key & 1:
+            self.keys &= ~(1 << key)
+            self._push_key(key, False)
+
+    def _push_key(self, key, is_pressed):
+        # the event is written before the counter, so the core never reads a stale one
+        buffer = self._shared.buf
+        buffer[_header.size + self._events_written % _events_size] = \
+            key | (0x80 if is_pressed else 0)
+        self._events_written = (self._events_written + 1) & 0xFFFFFFFF
+        struct.pack_into('<I', buffer, 8, self._events_written)
+
+    def wait_frame(self, timeout=None):
+        # waits for a frame published after the call
+        counter = self.screen.frames_published
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.screen.frames_published == counter:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            if self._process.is_alive():
+                self._call("quit")
+        except CoreProcessException:
+            pass
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._connection.close()
+        self.screen = None
+        self._shared.close()
+        self._shared.unlink()
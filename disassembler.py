@@ -0,0 +1,340 @@
+import argparse
+import collections
+import hashlib
+import json
+import sys
+
+import emulator
+import headless
+import library
+import settings
+
+_mnemonics = {
+    0x0: "SYS {0:03X}",
+    0x00E0: "CLS",
+    0x00EE: "RET",
+    0x1: "JP {0:03X}",
+    0x2: "CALL {0:03X}",
+    0x3: "SE V{0:X}, {1:02X}",
+    0x4: "SNE V{0:X}, {1:02X}",
+    0x5000: "SE V{0:X}, V{1:X}",
+    0x6: "LD V{0:X}, {1:02X}",
+    0x7: "ADD V{0:X}, {1:02X}",
+    0x8000: "LD V{0:X}, V{1:X}",
+    0x8001: "OR V{0:X}, V{1:X}",
+    0x8002: "AND V{0:X}, V{1:X}",
+    0x8003: "XOR V{0:X}, V{1:X}",
+    0x8004: "ADD V{0:X}, V{1:X}",
+    0x8005: "SUB V{0:X}, V{1:X}",
+    0x8006: "SHR V{0:X}",
+    0x8007: "SUBN V{0:X}, V{1:X}",
+    0x800e: "SHL V{0:X}",
+    0x9000: "SNE V{0:X}, V{1:X}",
+    0xA: "LD I, {0:03X}",
+    0xB: "JP V0, {0:03X}",
+    0xC: "RND V{0:X}, {1:02X}",
+    0xD: "DRW V{0:X}, V{1:X}, {2:X}",
+    0xE09E: "SKP V{0:X}",
+    0xE0A1: "SKNP V{0:X}",
+    0xF007: "LD V{0:X}, DT",
+    0xF00A: "LD V{0:X}, K",
+    0xF015: "LD DT, V{0:X}",
+    0xF018: "LD ST, V{0:X}",
+    0xF01E: "ADD I, V{0:X}",
+    0xF029: "LD F, V{0:X}",
+    0xF033: "LD B, V{0:X}",
+    0xF055: "LD [I], V{0:X}",
+    0xF065: "LD V{0:X}, [I]"
+}
+
+_skip_opcodes = {0x3, 0x4, 0x5000, 0x9000, 0xE09E, 0xE0A1}
+
+# analyses of recently disassembled ROMs by sha1
+_analyses = collections.OrderedDict()
+
+
+def format_instruction(word):
+    opcode, args = emulator.Emulator.parse_word(word)
+    if opcode not in _mnemonics:
+        return "DW {:04X}".format(word)
+    return _mnemonics[opcode].format(*args)
+
+
+class BasicBlock:
+    def __init__(self, start):
+        self.start = start
+        self.addresses = []
+        # addresses of the next blocks inside the same function
+        self.successors = []
+        # function entries called from the block
+        self.calls = []
+        self.is_indirect_jump = False
+        self.is_loop_header = False
+
+    @property
+    def end(self):
+        return self.addresses[-1] + 2
+
+    def to_json(self):
+        return {"start": self.start, "end": self.end,
+                "successors": self.successors, "calls": self.calls,
+                "is_indirect_jump": self.is_indirect_jump,
+                "is_loop_header": self.is_loop_header}
+
+
+class Analysis:
+    def __init__(self, data, start_address=0x200):
+        self.data = bytes(data)
+        self.sha1 = hashlib.sha1(self.data).hexdigest()
+        self.start_address = start_address
+        self.end_address = start_address + len(self.data)
+
+        # address -> (word, opcode, args) of reachable instructions
+        self.instructions = {}
+        self.blocks = {}
+        # start address and targets of CALL
+        self.entries = {start_address}
+        # function entry -> starts of its blocks
+        self.functions = {}
+        # (caller entry, callee entry)
+        self.calls = set()
+        self.loop_headers = set()
+        # targets of ANNN, usually sprites
+        self.data_references = set()
+        # targets outside of the ROM and not decodable words
+        self.external_targets = set()
+        self.invalid_addresses = set()
+
+        self._decode()
+        self._build_blocks()
+        self._build_functions()
+        self._find_loop_headers()
+
+    def _read_word(self, address):
+        offset = address - self.start_address
+        return (self.data[offset] << 8) | self.data[offset + 1]
+
+    def _is_in_rom(self, address):
+        return self.start_address <= address and address + 2 <= self.end_address
+
+    @staticmethod
+    def _successors(address, opcode, args):
+        # (next addresses in the same function, called function)
+        if opcode == 0x1:
+            return [args[0]], None
+        if opcode == 0x2:
+            return [address + 2], args[0]
+        if opcode == 0x00EE:
+            return [], None
+        if opcode == 0xB:
+            # real target depends on V0, only V0 == 0 is followed
+            return [args[0]], None
+        if opcode in _skip_opcodes:
+            return [address + 2, address + 4], None
+        return [address + 2], None
+
+    def _decode(self):
+        pending = [self.start_address]
+        while pending:
+            address = pending.pop()
+            if address in self.instructions or address in self.invalid_addresses or \
+                    address in self.external_targets:
+                continue
+            if not self._is_in_rom(address):
+                self.external_targets.add(address)
+                continue
+
+            word = self._read_word(address)
+            opcode, args = emulator.Emulator.parse_word(word)
+            if opcode not in _mnemonics:
+                self.invalid_addresses.add(address)
+                continue
+            self.instructions[address] = (word, opcode, args)
+
+            if opcode == 0xA:
+                self.data_references.add(args[0])
+            successors, callee = self._successors(address, opcode, args)
+            pending.extend(successors)
+            if callee is not None:
+                self.entries.add(callee)
+                pending.append(callee)
+
+    def _build_blocks(self):
+        leaders = set(self.entries)
+        for address, (_, opcode, args) in self.instructions.items():
+            successors, _ = self._successors(address, opcode, args)
+            if successors != [address + 2] or opcode == 0x2:
+                leaders.update(successors)
+                leaders.add(address + 2)
+
+        for start in sorted(leaders):
+            if start not in self.instructions:
+                continue
+            block = BasicBlock(start)
+            address = start
+            while True:
+                block.addresses.append(address)
+                _, opcode, args = self.instructions[address]
+                successors, callee = self._successors(address, opcode, args)
+                if callee is not None:
+                    block.calls.append(callee)
+                if opcode == 0xB:
+                    block.is_indirect_jump = True
+                if successors != [address + 2] or opcode == 0x2 or \
+                        address + 2 in leaders or address + 2 not in self.instructions:
+                    break
+                address += 2
+            block.successors = [successor for successor in successors
+                                if successor in self.instructions]
+            self.blocks[start] = block
+
+    def _build_functions(self):
+        for entry in sorted(self.entries):
+            if entry not in self.blocks:
+                continue
+            visited = set()
+            pending = [entry]
+            while pending:
+                start = pending.pop()
+                if start in visited:
+                    continue
+                visited.add(start)
+                block = self.blocks[start]
+                pending.extend(block.successors)
+                for callee in block.calls:
+                    self.calls.add((entry, callee))
+            self.functions[entry] = sorted(visited)
+
+    def _find_loop_headers(self):
+        # targets of back edges found by depth-first search
+        state = {}
+        for entry in sorted(self.functions):
+            if entry in state:
+                continue
+            state[entry] = 'open'
+            stack = [(entry, iter(self.blocks[entry].successors))]
+            while stack:
+                start, successors = stack[-1]
+                successor = next(successors, None)
+                if successor is None:
+                    state[start] = 'closed'
+                    stack.pop()
+                elif successor not in state:
+                    state[successor] = 'open'
+                    stack.append((successor, iter(self.blocks[successor].successors)))
+                elif state[successor] == 'open':
+                    self.loop_headers.add(successor)
+        for start in self.loop_headers:
+            self.blocks[start].is_loop_header = True
+
+    def data_ranges(self):
+        # ROM bytes which are never executed, as [start, end) ranges
+        code = set()
+        for address in self.instructions:
+            code.update((address, address + 1))
+        ranges = []
+        for address in range(self.start_address, self.end_address):
+            if address in code:
+                continue
+            if ranges and ranges[-1][1] == address:
+                ranges[-1][1] = address + 1
+            else:
+                ranges.append([address, address + 1])
+        return ranges
+
+    def to_json(self):
+        return {
+            "sha1": self.sha1,
+            "start": self.start_address,
+            "end": self.end_address,
+            "blocks": [self._block_to_json(self.blocks[start]) for start in sorted(self.blocks)],
+            "functions": [{"entry": entry, "blocks": blocks}
+                          for entry, blocks in sorted(self.functions.items())],
+            "calls": sorted(self.calls),
+            "loop_headers": sorted(self.loop_headers),
+            "data": self.data_ranges(),
+            "data_references": sorted(self.data_references),
+            "external_targets": sorted(self.external_targets),
+            "invalid": sorted(self.invalid_addresses)
+        }
+
+    def _block_to_json(self, block):
+        result = block.to_json()
+        result["instructions"] = [
+            [address, self.instructions[address][0],
+             format_instruction(self.instructions[address][0])]
+            for address in block.addresses]
+        return result
+
+    def to_text(self):
+        lines = []
+        data_ranges = {start: end for start, end in self.data_ranges()}
+        address = self.start_address
+        while address < self.end_address:
+            if address in data_ranges:
+                end = data_ranges[address]
+                for line_start in range(address, end, 8):
+                    line_end = min(end, line_start + 8)
+                    chunk = self.data[line_start - self.start_address:line_end - self.start_address]
+                    lines.append("{:03X}:  {:<24} ; data".format(
+                        line_start, " ".join("{:02X}".format(byte) for byte in chunk)))
+                address = end
+                continue
+
+            if address not in self.instructions:
+                # second byte of an instruction which is also executed from odd address
+                lines.append("{:03X}:  {:02X}".format(
+                    address, self.data[address - self.start_address]))
+                address += 1
+                continue
+            if address in self.functions:
+                lines.append("")
+                lines.append("sub_{:03X}:".format(address))
+            if address in self.blocks:
+                block = self.blocks[address]
+                label = "block_{:03X}:".format(address)
+                if block.is_loop_header:
+                    label += "  ; loop"
+                lines.append(label)
+            word = self.instructions[address][0]
+            lines.append("{:03X}:  {:04X}  {}".format(address, word, format_instruction(word)))
+            address += 2
+        return "\n".join(lines).lstrip("\n") + "\n"
+
+
+def analyze(data, start_address=0x200):
+    key = (hashlib.sha1(bytes(data)).hexdigest(), start_address)
+    analysis = _analyses.get(key)
+    if analysis is None:
+        analysis = Analysis(data, start_address)
+        _analyses[key] = analysis
+        while len(_analyses) > settings.rom_cache_size:
+            _analyses.popitem(last=False)
+    else:
+        _analyses.move_to_end(key)
+    return analysis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Disassemble a CHIP-8 ROM and build its control-flow graph")
+    parser.add_argument("rom", help="ROM file, name of game or its sha1")
+    parser.add_argument("--json", action="store_true", help="print graph as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        data = library.read_rom(headless.resolve_rom(args.rom))
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    analysis = analyze(data)
+    if args.json:
+        print(json.dumps(analysis.to_json(), indent=2))
+    else:
+        sys.stdout.write(analysis.to_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
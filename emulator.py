@@ -1,16 +1,62 @@
 import random
+import struct
 
+import keypad
 import memory
 import screen
+import settings
 
 
 class ImpossibleOperationException(Exception):
     pass
 
 
+class IncorrectStateException(Exception):
+    """Сохраненное состояние повреждено или имеет другую версию"""
+    pass
+
+
 class Emulator:
-    def __init__(self):
-        self.screen = screen.Screen()
+    # (handler, args, is_draw, is_increase_pointer) for every 16-bit word,
+    # shared by all instances and built on first use
+    _decode_table = None
+
+    # sprites of hex digits, loaded at address 0
+    font = (
+        0xF0, 0x90, 0x90, 0x90, 0xF0,
+        0x20, 0x60, 0x20, 0x20, 0x70,
+        0xF0, 0x10, 0xF0, 0x80, 0xF0,
+        0xF0, 0x10, 0xF0, 0x10, 0xF0,
+        0x90, 0x90, 0xF0, 0x10, 0x10,
+        0xF0, 0x80, 0xF0, 0x10, 0xF0,
+        0xF0, 0x80, 0xF0, 0x90, 0xF0,
+        0xF0, 0x10, 0x20, 0x40, 0x40,
+        0xF0, 0x90, 0xF0, 0x90, 0xF0,
+        0xF0, 0x90, 0xF0, 0x10, 0xF0,
+        0xF0, 0x90, 0xF0, 0x90, 0x90,
+        0xE0, 0x90, 0xE0, 0x90, 0xE0,
+        0xF0, 0x80, 0x80, 0x80, 0xF0,
+        0xE0, 0x90, 0x90, 0x90, 0xE0,
+        0xF0, 0x80, 0xF0, 0x80, 0xF0,
+        0xF0, 0x80, 0xF0, 0x80, 0x80
+    )
+
+    state_magic = b'C8ST'
+    state_version = 3
+    # magic, version, memory pointer, I, delay timer, sound timer,
+    # waiting mode, keypad state, last pressed key (0xFF if none), cycles,
+    # next timer cycle, draws count, stack length
+    _state_header = struct.Struct('>4sBHHBBBHBQQQB')
+    # Mersenne Twister words and position of the CXNN generator,
+    # stored after the stack; getstate and setstate go through a tuple of
+    # 625 ints, about half of the save_state time (~12 of 24 us), which is
+    # paid for exact replays after any number of CXNN draws
+    _random_state = struct.Struct('>625I')
+    random_state_size = _random_state.size
+
+    def __init__(self, packed_screen=False,
+                 cycles_per_timer_tick=settings.instructions_per_frame):
+        self.screen = screen.PackedScreen() if packed_screen else screen.Screen()
         self.memory = memory.Memory()
         self.registers = bytearray(16)
 
@@ -21,29 +67,31 @@ class Emulator:
 
         self.delay_timer = 0
         self.sound_timer = 0
+        # timers are decreased once per cycles_per_timer_tick executed instructions
+        self.cycles_per_timer_tick = cycles_per_timer_tick
+        self.cycles = 0
+        self._next_timer_cycle = cycles_per_timer_tick
+        self.draws_count = 0
 
         self.is_waiting_mode = False
         self.is_need_to_draw = False
-        self.pressed_button = None
-
-        self.font = [
-            0xF0, 0x90, 0x90, 0x90, 0xF0,
-            0x20, 0x60, 0x20, 0x20, 0x70,
-            0xF0, 0x10, 0xF0, 0x80, 0xF0,
-            0xF0, 0x10, 0xF0, 0x10, 0xF0,
-            0x90, 0x90, 0xF0, 0x10, 0x10,
-            0xF0, 0x80, 0xF0, 0x10, 0xF0,
-            0xF0, 0x80, 0xF0, 0x90, 0xF0,
-            0xF0, 0x10, 0x20, 0x40, 0x40,
-            0xF0, 0x90, 0xF0, 0x90, 0xF0,
-            0xF0, 0x90, 0xF0, 0x10, 0xF0,
-            0xF0, 0x90, 0xF0, 0x90, 0x90,
-            0xE0, 0x90, 0xE0, 0x90, 0xE0,
-            0xF0, 0x80, 0x80, 0x80, 0xF0,
-            0xE0, 0x90, 0x90, 0x90, 0xE0,
-            0xF0, 0x80, 0xF0, 0x80, 0xF0,
-            0xF0, 0x80, 0xF0, 0x80, 0x80
-        ]
+        self.keypad = keypad.Keypad()
+
+        # memory right after the last ROM was loaded, used by restart
+        self.rom_image = None
+
+        # FX07; 3XNN; 1NNN loops waiting for the delay timer are
+        # fast-forwarded to the next timer tick
+        self.skip_idle_loops = True
+        # set by FX07 finding an idle loop or by FX0A without pressed key,
+        # the rest of the chunk is then not executed
+        self._is_idle = False
+        # address of the idle loop found by the last FX07
+        self._idle_loop = None
+
+        # own generator for CXNN, so runs with the same seed are reproducible
+        self.random = random.Random()
+
         self._load_font_in_memory()
 
         self.instructions = {
@@ -84,8 +132,21 @@ class Emulator:
             0xF065: self._op_0xf_65
         }
 
+        if Emulator._decode_table is None:
+            Emulator._decode_table = self._build_decode_table()
+
     def reset(self):
         self.memory.reset()
+        self._reset_state()
+
+    def restart(self):
+        if self.rom_image is None:
+            self.reset()
+            return
+        self.memory.load_image(self.rom_image)
+        self._reset_state()
+
+    def _reset_state(self):
         self.screen.reset()
         self.registers = bytearray(16)
 
@@ -94,9 +155,99 @@ class Emulator:
         self.register_i = 0x200
         self.delay_timer = 0
         self.sound_timer = 0
+        self.cycles = 0
+        self._next_timer_cycle = self.cycles_per_timer_tick
+        self.draws_count = 0
 
         self.is_waiting_mode = False
-        self.pressed_button = None
+        self.keypad.reset()
+
+    def seed(self, value):
+        self.random.seed(value)
+
+    @property
+    def pressed_button(self):
+        # the last pressed key which was not consumed by FX0A
+        return self.keypad.last_pressed
+
+    @pressed_button.setter
+    def pressed_button(self, key):
+        # only key bits are changed, queued events and latencies are kept
+        if key is None:
+            key = self.keypad.last_pressed
+            if key is not None:
+                self.keypad.state &= ~(1 << key)
+                self.keypad.latched &= ~(1 << key)
+                self.keypad.last_pressed = None
+        else:
+            self.keypad.press(key)
+
+    def press_button(self, key):
+        self.keypad.press(key)
+
+    def release_button(self, key):
+        self.keypad.release(key)
+
+    def save_state(self):
+        if len(self.stack) > 0xFF:
+            raise ImpossibleOperationException(
+                "Stack of {} addresses is too deep to save".format(len(self.stack)))
+        return b''.join((
+            self._state_header.pack(
+                self.state_magic, self.state_version,
+                self.memory_pointer, self.register_i,
+                self.delay_timer, self.sound_timer,
+                self.is_waiting_mode, self.keypad.state,
+                0xFF if self.keypad.last_pressed is None else self.keypad.last_pressed,
+                self.cycles, self._next_timer_cycle, self.draws_count,
+                len(self.stack)),
+            struct.pack('>{}H'.format(len(self.stack)), *self.stack),
+            self._random_state.pack(*self.random.getstate()[1]),
+            self.registers,
+            self.memory._memory,
+            self.screen.to_bytes()
+        ))
+
+    def load_state(self, state):
+        header_size = self._state_header.size
+        try:
+            (magic, version, memory_pointer, register_i, delay_timer, sound_timer,
+             is_waiting_mode, keypad_state, last_pressed, cycles, next_timer_cycle,
+             draws_count, stack_length) = self._state_header.unpack_from(state)
+        except struct.error:
+            raise IncorrectStateException("State is too short")
+        if magic != self.state_magic or version != self.state_version:
+            raise IncorrectStateException("Unsupported state format")
+
+        view = memoryview(state)
+        random_start = header_size + 2 * stack_length
+        registers_start = random_start + self._random_state.size
+        memory_start = registers_start + len(self.registers)
+        screen_start = memory_start + self.memory.memory_size
+        if len(view) != screen_start + self.screen.size:
+            raise IncorrectStateException("State has incorrect size")
+
+        random_state = self._random_state.unpack_from(state, random_start)
+        try:
+            self.random.setstate((3, random_state, None))
+        except ValueError:
+            raise IncorrectStateException("State has incorrect random generator")
+        self.stack = list(struct.unpack_from('>{}H'.format(stack_length), state, header_size))
+        self.registers[:] = view[registers_start:memory_start]
+        self.memory.load_image(view[memory_start:screen_start])
+        self.screen.load_bytes(view[screen_start:])
+
+        self.memory_pointer = memory_pointer
+        self.register_i = register_i
+        self.delay_timer = delay_timer
+        self.sound_timer = sound_timer
+        self.is_waiting_mode = bool(is_waiting_mode)
+        self.keypad.reset()
+        self.keypad.state = keypad_state
+        self.keypad.last_pressed = None if last_pressed == 0xFF else last_pressed
+        self.cycles = cycles
+        self._next_timer_cycle = next_timer_cycle
+        self.draws_count = draws_count
 
     def degrease_timers_if_need(self):
         if self.delay_timer > 0:
@@ -104,9 +255,44 @@ class Emulator:
         if self.sound_timer > 0:
             self.sound_timer -= 1
 
+    def advance_cycles(self, count):
+        self.cycles += count
+        while self.cycles >= self._next_timer_cycle:
+            self.degrease_timers_if_need()
+            self._next_timer_cycle += self.cycles_per_timer_tick
+
+    @property
+    def is_waiting_for_key(self):
+        return self.is_waiting_mode and self.keypad.last_pressed is None
+
+    def run_cycles(self, count):
+        end = self.cycles + count
+        while self.cycles < end:
+            chunk = min(end, self._next_timer_cycle) - self.cycles
+            self._is_idle = False
+            for executed in range(1, chunk + 1):
+                self.make_tact()
+                if self._is_idle:
+                    break
+            if self._is_idle:
+                self._is_idle = False
+                if self.is_waiting_mode:
+                    # FX0A would be executed again and again, only timers
+                    # are changing until a key is pressed
+                    self.advance_cycles(end - self.cycles)
+                    break
+                self._skip_idle_loop(chunk - executed)
+            self.advance_cycles(chunk)
+        return count
+
+    def _skip_idle_loop(self, count):
+        # delay timer does not change until the end of the chunk, so the loop
+        # only cycles through its three instructions; FX07 has been executed
+        # and the next one is 3XNN which does not skip
+        self.memory_pointer = self._idle_loop + (2, 4, 0)[count % 3]
+
     def _load_font_in_memory(self):
-        for index, byte in enumerate(self.font):
-            self.memory.write_byte(index, byte)
+        self.memory.load_data(0, self.font)
 
     def load_file_in_memory(self, file_name):
         try:
@@ -115,7 +301,24 @@ class Emulator:
         except Exception:
             raise BlockingIOError("Can't read a file {}".format(file_name))
 
+        self.load_rom(data)
+
+    def load_rom(self, data):
         self.memory.load_data(self.memory_pointer, data)
+        self.rom_image = self.memory.to_bytes()
+
+    def load_cached_rom(self, file_name, cache):
+        # restarts the emulator with the ROM, file is read only on a cache miss
+        self.rom_image = cache.get_image(file_name, self.make_rom_image)
+        self.restart()
+
+    def make_rom_image(self, data):
+        if 0x200 + len(data) > self.memory.memory_size:
+            raise memory.MemoryOverflowException()
+        image = bytearray(self.memory.memory_size)
+        image[:len(self.font)] = bytes(self.font)
+        image[0x200:0x200 + len(data)] = data
+        return image
 
     def _increase_memory_pointer(self):
         self.memory_pointer += 0x2
@@ -123,18 +326,36 @@ class Emulator:
     def _skip_next_instruction(self):
         self.memory_pointer += 0x4
 
+    def _build_decode_table(self):
+        table = []
+        for word in range(0x10000):
+            opcode, args = Emulator.parse_word(word)
+            if opcode in self.instructions:
+                handler = self.instructions[opcode].__func__
+            else:
+                handler = Emulator._op_unknown
+                args = [opcode]
+            table.append((
+                handler,
+                tuple(args),
+                opcode == 0xD,
+                # commands which are changing memory pointer by themselves
+                opcode not in (0x1, 0xB, 0x2, 0x00ee)
+            ))
+        return table
+
     def make_tact(self):
         word = self.memory.read_opcode(self.memory_pointer)
-        opcode, args = Emulator.parse_word(word)
+        handler, args, is_draw, is_increase_pointer = self._decode_table[word]
 
-        self.execute_instruction(opcode, args)
-        self.is_need_to_draw = opcode is 0xD
+        handler(self, *args)
+        self.is_need_to_draw = is_draw
 
         # if not keypress waiting mode,
         # increase memory pointer to all commands except commands
         # which are changing memory pointer
-        if not self.is_waiting_mode and opcode not in [0x1, 0xB, 0x2, 0x00ee]:
-            self._increase_memory_pointer()
+        if is_increase_pointer and not self.is_waiting_mode:
+            self.memory_pointer += 0x2
 
     def execute_instruction(self, opcode, args):
         if opcode not in self.instructions:
@@ -179,6 +400,9 @@ class Emulator:
 
         return [hundreds, tens, ones]
 
+    def _op_unknown(self, opcode):
+        self.execute_instruction(opcode, [])
+
     def _op_0x0(self, address):
         pass
 
@@ -266,32 +490,47 @@ class Emulator:
         self.memory_pointer = address + self.registers[0]
 
     def _op_0xc(self, register, byte):
-        self.registers[register] = random.randint(0, 0xFF) & byte
+        self.registers[register] = self.random.randint(0, 0xFF) & byte
 
     def _op_0xd(self, x, y, bytes_count):
-        data = self.memory.read(self.register_i, bytes_count)
+        data = self.memory.view(self.register_i, bytes_count)
         start_x = self.registers[x]
         start_y = self.registers[y]
         is_intersect = self.screen.draw_sprite(start_x, start_y, data)
         self.registers[0xF] = is_intersect
+        self.draws_count += 1
 
     def _op_0xe_9e(self, x):
-        if self.pressed_button == self.registers[x]:
+        if self.keypad.is_pressed(self.registers[x]):
             self._increase_memory_pointer()
 
     def _op_0xe_a1(self, x):
-        if self.pressed_button != self.registers[x]:
+        if not self.keypad.is_pressed(self.registers[x]):
             self._increase_memory_pointer()
 
     def _op_0xf_07(self, x):
         self.registers[x] = self.delay_timer
+        if self.skip_idle_loops:
+            self._find_idle_loop(x)
+
+    def _find_idle_loop(self, x):
+        address = self.memory_pointer
+        if address + 6 > self.memory.memory_size:
+            return
+        skip_word = self.memory.read_opcode(address + 2)
+        if skip_word & 0xFF00 == 0x3000 | (x << 8) and \
+                skip_word & 0xFF != self.delay_timer and \
+                self.memory.read_opcode(address + 4) == 0x1000 | address:
+            self._idle_loop = address
+            self._is_idle = True
 
     def _op_0xf_0a(self, x):
-        if self.pressed_button is None:
+        key = self.keypad.take_pressed()
+        if key is None:
             self.is_waiting_mode = True
+            self._is_idle = self.skip_idle_loops
             return
-        self.registers[x] = self.pressed_button
-        self.pressed_button = None
+        self.registers[x] = key
         self.is_waiting_mode = False
 
     def _op_0xf_15(self, x):
@@ -315,13 +554,7 @@ class Emulator:
             self.memory.write_byte(self.register_i + i, bcd_format[i])
 
     def _op_0xf_55(self, x):
-        data = bytearray(x + 1)
-        for i in range(x + 1):
-            data[i] = self.registers[i]
-        self.memory.load_data(self.register_i, data)
+        self.memory.load_data(self.register_i, memoryview(self.registers)[:x + 1])
 
     def _op_0xf_65(self, x):
-        data = self.memory.read(self.register_i, x + 1)
-
-        for i in range(x + 1):
-            self.registers[i] = data[i]
+        self.registers[:x + 1] = self.memory.view(self.register_i, x + 1)
@@ -0,0 +1,98 @@
+import argparse
+import multiprocessing
+import sys
+import time
+
+import emulator
+import headless
+
+# emulator reused by all jobs of a worker process
+_worker_emulator = None
+
+
+class Job:
+    def __init__(self, rom, cycles, key_script="", engine="interpreter"):
+        self.rom = rom
+        self.cycles = cycles
+        self.key_script = key_script
+        self.engine = engine
+
+
+def _init_worker():
+    global _worker_emulator
+    _worker_emulator = emulator.Emulator()
+
+
+def _run_job(indexed_job):
+    index, job = indexed_job
+    try:
+        result = headless.run_rom(
+            headless.resolve_rom(job.rom), cycles=job.cycles,
+            key_events=headless.parse_key_script(job.key_script),
+            engine=job.engine, chip_emulator=_worker_emulator)
+    except Exception as e:
+        # one broken ROM must not abort the whole batch
+        return {"job": index, "rom": job.rom,
+                "error": "{}: {}".format(type(e).__name__, e)}
+
+    result["job"] = index
+    result["screen"] = _worker_emulator.screen.to_bytes()
+    result["registers"] = bytes(_worker_emulator.registers)
+    result["register_i"] = _worker_emulator.register_i
+    result["memory_pointer"] = _worker_emulator.memory_pointer
+    return result
+
+
+def run_jobs(jobs, processes=None, chunk_size=1):
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for result in pool.imap_unordered(_run_job, enumerate(jobs), chunk_size):
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run many CHIP-8 emulations on all cores")
+    parser.add_argument("roms", nargs="+",
+                        help="ROM files or names of games from games/ folder")
+    parser.add_argument("-c", "--cycles", type=int, required=True,
+                        help="instructions per job")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="jobs per ROM")
+    parser.add_argument("-k", "--keys", default="",
+                        help="key script: 'frame:+key,frame:-key', e.g. '60:+5,90:-5'")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes (all cores by default)")
+    parser.add_argument("--engine", choices=["interpreter", "blocks"],
+                        default="interpreter")
+    args = parser.parse_args(argv)
+
+    try:
+        headless.parse_key_script(args.keys)
+        for rom in args.roms:
+            headless.resolve_rom(rom)
+    except (headless.IncorrectKeyScriptException, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    jobs = [Job(rom, args.cycles, args.keys, args.engine)
+            for rom in args.roms for _ in range(args.repeat)]
+
+    instructions = 0
+    errors = 0
+    start_time = time.perf_counter()
+    for result in run_jobs(jobs, args.processes):
+        if "error" in result:
+            errors += 1
+            print("#{:<5} {:<10} {}".format(result["job"], result["rom"], result["error"]))
+            continue
+        instructions += result["instructions"]
+        print("#{:<5} {}".format(result["job"], headless.format_result(result)))
+    seconds = time.perf_counter() - start_time
+
+    print("{} jobs, {} failed, {} instructions in {:.2f} s: {:.0f} instr/s".format(
+        len(jobs), errors, instructions, seconds, instructions / seconds if seconds else 0))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
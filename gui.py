@@ -1,14 +1,20 @@
+import os
 import sys
 import threading
 import time
 from contextlib import contextmanager
 
 import PyQt5.QtWidgets
-from PyQt5.QtGui import QKeySequence, QPainter, QColor, QPen
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QKeySequence, QPainter, QColor, QImage
 from PyQt5.QtMultimedia import QSound
 from PyQt5.QtWidgets import QMainWindow
 
 import emulator
+import library
+import movie
+import rewind
+import scheduler
 import settings
 
 
@@ -27,7 +33,7 @@ def start_thread(method):
 
 
 class EmulatorWindow(QMainWindow):
-    def __init__(self, parent_emulator, parent=None):
+    def __init__(self, parent_emulator, file_name=None, parent=None):
         super().__init__(parent)
 
         self.setWindowTitle(settings.window_title + " | Delay mode: activated")
@@ -37,43 +43,57 @@ class EmulatorWindow(QMainWindow):
         self.beep = QSound(settings.sounds_folder + settings.beep)
         self.screen = Screen(parent_emulator.screen, self)
         self.is_pause_thread = False
-        self.is_sound_timer_running = False
-        self.is_delay_timer_running = False
         self.is_need_to_make_delay = True
+        self.is_rewinding = False
+        self.rewind_buffer = rewind.RewindBuffer()
+        self.scheduler = None
+        self.file_name = file_name
+        self.recorder = None
+        # wakes emulator thread blocked on FX0A
+        self.key_event = threading.Event()
 
         self.setCentralWidget(self.screen)
         start_thread(self.start_emulator_work)
 
     def change_delay_mode(self):
         self.is_need_to_make_delay = not self.is_need_to_make_delay
+        self.update_title()
+
+    def update_title(self):
         mode = "activated" if self.is_need_to_make_delay else "deactivated"
-        self.setWindowTitle(settings.window_title + " | Delay mode: {0}".format(mode))
-
-    def start_delay_timer_work(self):
-        self.is_delay_timer_running = True
-        while not self.is_pause_thread and self.emulator.delay_timer > 0:
-            self.emulator.delay_timer -= 1
-            time.sleep(1 / settings.timer_frequency)
-        self.is_delay_timer_running = False
-
-    def start_sound_timer_work(self):
-        self.is_sound_timer_running = True
-        while not self.is_pause_thread and self.emulator.sound_timer > 0:
-            self.emulator.sound_timer -= 1
-            time.sleep(1 / settings.timer_frequency)
-        self.is_sound_timer_running = False
+        title = settings.window_title + " | Delay mode: {0}".format(mode)
+        if self.recorder is not None:
+            title += " | Recording"
+        self.setWindowTitle(title)
 
     def start_emulator_work(self):
+        self.scheduler = scheduler.FrameScheduler(self.emulator)
         while not self.is_pause_thread:
-            self.emulator.make_tact()
-            if self.emulator.is_need_to_draw:
-                if self.is_need_to_make_delay:
-                    time.sleep(0.001)
-                self.screen.update()
-            if self.emulator.delay_timer > 0 and not self.is_delay_timer_running:
-                start_thread(self.start_delay_timer_work)
-            if self.emulator.sound_timer > 0 and not self.is_sound_timer_running:
-                start_thread(self.start_sound_timer_work)
+            self.apply_key_events()
+            if self.emulator.is_waiting_for_key and not self.is_rewinding:
+                self.key_event.clear()
+                if not self.emulator.keypad.has_events() and not self.is_pause_thread:
+                    self.scheduler.wait_for_input(self.key_event)
+                    continue
+            if self.is_rewinding and self.recorder is None:
+                if self.rewind_buffer.rewind(self.emulator):
+                    self.emulator.screen.publish()
+                    self.screen.update_dirty_regions()
+            else:
+                is_drawn = self.scheduler.run_frame()
+                self.rewind_buffer.record(self.emulator)
+                if is_drawn:
+                    self.screen.update_dirty_regions()
+            if self.is_need_to_make_delay:
+                self.scheduler.wait_next_frame()
+            else:
+                self.scheduler.reset_pacing()
+
+    def apply_key_events(self):
+        # key events from GUI thread are applied at frame boundaries
+        for key, is_pressed in self.emulator.keypad.drain():
+            if self.recorder is not None:
+                self.recorder.add_event(key, is_pressed)
 
     def generate_menu(self):
         menubar = self.menuBar()
@@ -89,6 +109,10 @@ class EmulatorWindow(QMainWindow):
         about_act.setShortcut(QKeySequence("Ctrl+H"))
         about_act.triggered.connect(self.show_help)
 
+        open_library_act = PyQt5.QtWidgets.QAction("Open from library", self)
+        open_library_act.setShortcut(QKeySequence("Ctrl+L"))
+        open_library_act.triggered.connect(self.load_from_library)
+
         quit_act = PyQt5.QtWidgets.QAction("Quit", self)
         quit_act.setShortcut(QKeySequence("Ctrl+Q"))
         quit_act.triggered.connect(self.close)
@@ -97,21 +121,56 @@ class EmulatorWindow(QMainWindow):
         change_delay_mode_act.setShortcut(QKeySequence("Ctrl+D"))
         change_delay_mode_act.triggered.connect(self.change_delay_mode)
 
+        frame_stats_act = PyQt5.QtWidgets.QAction("Frame statistics", self)
+        frame_stats_act.setShortcut(QKeySequence("Ctrl+F"))
+        frame_stats_act.triggered.connect(self.show_frame_stats)
+
+        record_act = PyQt5.QtWidgets.QAction("Start/stop recording", self)
+        record_act.setShortcut(QKeySequence("Ctrl+R"))
+        record_act.triggered.connect(self.change_recording_mode)
+
         menu_file.addAction(open_act)
+        menu_file.addAction(open_library_act)
         menu_file.addAction(quit_act)
         menu_help.addAction(about_act)
         menu_game.addAction(change_delay_mode_act)
+        menu_game.addAction(frame_stats_act)
+        menu_game.addAction(record_act)
 
     def keyPressEvent(self, e):
         key_code = e.key()
-        if key_code in settings.key_codes.keys():
-            self.emulator.pressed_button = settings.key_codes[key_code]
+        if key_code == settings.rewind_key_code:
+            self.is_rewinding = True
+            self.key_event.set()
+        elif key_code in settings.key_codes.keys():
+            self.emulator.keypad.push(settings.key_codes[key_code], True)
+            self.key_event.set()
 
     def keyReleaseEvent(self, e):
         key_code = e.key()
-        if key_code in settings.key_codes.keys() and \
-                        self.emulator.pressed_button == settings.key_codes[key_code]:
-            self.emulator.pressed_button = None
+        if key_code == settings.rewind_key_code and not e.isAutoRepeat():
+            self.is_rewinding = False
+        elif key_code in settings.key_codes.keys() and not e.isAutoRepeat():
+            self.emulator.keypad.push(settings.key_codes[key_code], False)
+
+    def restart_game(self, file_name, is_recording=False):
+        self.is_pause_thread = True
+        self.key_event.set()
+        time.sleep(0.1)
+        data = library.read_rom(file_name)
+        self.emulator.reset()
+        self.rewind_buffer.clear()
+        self.emulator.load_rom(data)
+        self.file_name = file_name
+        self.recorder = None
+        if is_recording:
+            self.recorder = movie.MovieRecorder(
+                self.emulator, os.path.basename(file_name), data)
+        self.emulator.screen.publish()
+        self.screen.update_dirty_regions()
+        self.update_title()
+        self.is_pause_thread = False
+        start_thread(self.start_emulator_work)
 
     def load_file(self):
         name = PyQt5.QtWidgets.QFileDialog.getOpenFileName(
@@ -121,13 +180,7 @@ class EmulatorWindow(QMainWindow):
             return
 
         try:
-            self.is_pause_thread = True
-            time.sleep(0.1)
-            self.emulator.reset()
-            self.emulator.load_file_in_memory(name[0])
-            self.screen.update()
-            self.is_pause_thread = False
-            start_thread(self.start_emulator_work)
+            self.restart_game(name[0])
         except Exception as e:
             PyQt5.QtWidgets.QMessageBox.critical(
                 self,
@@ -137,6 +190,67 @@ class EmulatorWindow(QMainWindow):
                 "обратитесь к разработчику проекта",
                 PyQt5.QtWidgets.QMessageBox.Close)
 
+    def load_from_library(self):
+        try:
+            rom_library = library.default_library()
+            items = ["{}  {}".format(entry.id, entry.description[:60])
+                     for entry in rom_library.entries]
+            item, is_ok = PyQt5.QtWidgets.QInputDialog.getItem(
+                self, 'Библиотека игр', 'Игра:', items, 0, False)
+            if not is_ok or not item:
+                return
+
+            entry = rom_library.resolve(item.split()[0])
+            self.restart_game(rom_library.locate(entry.id))
+        except Exception as e:
+            PyQt5.QtWidgets.QMessageBox.critical(
+                self,
+                "Не удалось загрузить файл",
+                "Не удалось загрузить игру из библиотеки. "
+                "Проверьте папку games и архив chip8.zip",
+                PyQt5.QtWidgets.QMessageBox.Close)
+
+    def change_recording_mode(self):
+        if self.recorder is None:
+            if self.file_name is not None:
+                # movie is always recorded from the start of the game
+                self.restart_game(self.file_name, is_recording=True)
+            return
+
+        self.is_pause_thread = True
+        self.key_event.set()
+        time.sleep(0.1)
+        recorded_movie = self.recorder.stop()
+        self.recorder = None
+        self.is_pause_thread = False
+        start_thread(self.start_emulator_work)
+        self.update_title()
+
+        name = PyQt5.QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Сохранить запись', settings.games_folder,
+            "CHIP-8 movies (*.c8m)")
+        if name == ('', ''):
+            return
+        try:
+            recorded_movie.save(name[0])
+        except OSError:
+            PyQt5.QtWidgets.QMessageBox.critical(
+                self,
+                "Не удалось сохранить запись",
+                "Не удалось сохранить файл {}".format(name[0]),
+                PyQt5.QtWidgets.QMessageBox.Close)
+
+    def show_frame_stats(self):
+        report = self.scheduler.jitter_report() if self.scheduler else {}
+        report.update(self.emulator.keypad.latency_report())
+        text = "\n".join("{}: {:.6f}".format(key, value) if isinstance(value, float)
+                         else "{}: {}".format(key, value)
+                         for key, value in report.items())
+        PyQt5.QtWidgets.QMessageBox.information(
+            self, "Frame statistics", text,
+            PyQt5.QtWidgets.QMessageBox.Ok
+        )
+
     def show_help(self):
         PyQt5.QtWidgets.QMessageBox.information(
             self, "About", settings.help_msg,
@@ -144,6 +258,121 @@ class EmulatorWindow(QMainWindow):
         )
 
 
+class CoreProcessWindow(QMainWindow):
+    # emulator core runs in a child process, the window only polls
+    # the shared framebuffer and sends keys and commands
+    def __init__(self, core, file_name=None, parent=None):
+        super().__init__(parent)
+
+        self.setWindowTitle(settings.window_title + " | Process mode")
+        self.core = core
+        self.file_name = file_name
+        self.is_paused = False
+        self.saved_state = None
+        self.generate_menu()
+
+        self.screen = Screen(core.screen, self)
+        self.setCentralWidget(self.screen)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_frame)
+        self.timer.start(1000 // settings.timer_frequency)
+
+    def generate_menu(self):
+        menubar = self.menuBar()
+        menu_file = menubar.addMenu("&File")
+        menu_game = menubar.addMenu("&Game")
+
+        actions = [
+            (menu_file, "Open", "Ctrl+O", self.load_file),
+            (menu_file, "Quit", "Ctrl+Q", self.close),
+            (menu_game, "Pause", "Ctrl+P", self.change_pause_mode),
+            (menu_game, "Restart", "Ctrl+N", self.reset),
+            (menu_game, "Save state", "F5", self.save_state),
+            (menu_game, "Load state", "F9", self.load_state),
+        ]
+        for menu, name, shortcut, method in actions:
+            action = PyQt5.QtWidgets.QAction(name, self)
+            action.setShortcut(QKeySequence(shortcut))
+            action.triggered.connect(method)
+            menu.addAction(action)
+
+    def keyPressEvent(self, e):
+        if e.key() in settings.key_codes.keys():
+            self.core.press_button(settings.key_codes[e.key()])
+
+    def keyReleaseEvent(self, e):
+        if e.key() in settings.key_codes.keys() and not e.isAutoRepeat():
+            self.core.release_button(settings.key_codes[e.key()])
+
+    def restart_game(self, file_name):
+        self.core.load_rom(library.read_rom(file_name))
+        self.file_name = file_name
+        self.saved_state = None
+        self.core.pause(self.is_paused)
+
+    def load_file(self):
+        name = PyQt5.QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Загрузить файл', settings.games_folder,
+            "All Files (*)")
+        if name == ('', ''):
+            return
+        try:
+            self.restart_game(name[0])
+        except (OSError, core_process.CoreProcessException):
+            PyQt5.QtWidgets.QMessageBox.critical(
+                self,
+                "Не удалось загрузить файл",
+                "Не удалось загрузить файл {}".format(name[0]),
+                PyQt5.QtWidgets.QMessageBox.Close)
+
+    def update_frame(self):
+        self.screen.update_dirty_regions()
+        error = self.run_command(self.core.take_error)
+        if error is not None:
+            # the core pauses itself on error
+            self.set_paused(True)
+            self.show_error(error)
+
+    def show_error(self, error):
+        PyQt5.QtWidgets.QMessageBox.critical(
+            self, "Ошибка эмулятора", error, PyQt5.QtWidgets.QMessageBox.Close)
+
+    def run_command(self, method, *args):
+        # commands fail when the core process died, which must not escape a Qt slot
+        try:
+            return method(*args)
+        except core_process.CoreProcessException as e:
+            self.timer.stop()
+            self.show_error(str(e))
+
+    def set_paused(self, is_paused):
+        self.is_paused = is_paused
+        self.setWindowTitle(settings.window_title + " | Process mode" +
+                            (" | Paused" if self.is_paused else ""))
+
+    def change_pause_mode(self):
+        self.set_paused(not self.is_paused)
+        self.run_command(self.core.pause, self.is_paused)
+
+    def reset(self):
+        self.run_command(self.core.reset)
+
+    def save_state(self):
+        state = self.run_command(self.core.save_state)
+        if state is not None:
+            self.saved_state = state
+
+    def load_state(self):
+        if self.saved_state is not None:
+            self.run_command(self.core.load_state, self.saved_state)
+
+    def closeEvent(self, e):
+        self.timer.stop()
+        self.core.close()
+        super().closeEvent(e)
+
+
 class Screen(PyQt5.QtWidgets.QFrame):
     def __init__(self, screen_data, parent=None):
         super().__init__(parent)
@@ -152,48 +381,64 @@ class Screen(PyQt5.QtWidgets.QFrame):
         height = screen_data.height * settings.pixel_size
         self.setFixedSize(width, height)
         self.screen_data = screen_data
+        self._color_table = [QColor(settings.background_color).rgb(),
+                             QColor(settings.active_color).rgb()]
         self.update()
 
-    def draw_pixels(self, qp):
-        qp.setPen(QPen(0))
-        active_color = QColor(settings.active_color)
-        background_color = QColor(settings.background_color)
-        for y in range(self.screen_data.height):
-            for x in range(self.screen_data.width):
-                value = self.screen_data.get_value(x, y)
-                color = active_color if value else background_color
-                qp.setBrush(QColor(color))
-                qp.drawRect(
-                    x * settings.pixel_size,
-                    y * settings.pixel_size,
-                    settings.pixel_size,
-                    settings.pixel_size
-                )
+    def update_dirty_regions(self):
+        size = settings.pixel_size
+        for x, y, width, height in self.screen_data.take_dirty_regions():
+            self.update(x * size, y * size, width * size, height * size)
+
+    def _get_image(self):
+        # only the published frame is read, the emulator thread writes it again
+        # only after two more publications, and wrapping it costs nothing
+        buffer = self.screen_data.front
+        image = QImage(buffer, self.screen_data.width, self.screen_data.height,
+                       self.screen_data.width, QImage.Format_Indexed8)
+        image.setColorTable(self._color_table)
+        return image
+
+    def draw_image(self, qp):
+        qp.drawImage(self.rect(), self._get_image())
 
     def paintEvent(self, e):
         with painter(self) as qp:
-            self.draw_pixels(qp)
+            self.draw_image(qp)
 
 
 def print_help():
     print("This program is a CHIP-8 emulator (v. 0.9).\n"
           "To run emulator: write path to file as first argument.\n"
           "Example: python gui.py /games/MAZE\n"
+          "Use --process to run emulator core in a separate process.\n"
           "Created by Leofwin <leofwin98@yandex.ru>")
 
 
 if __name__ == "__main__":
-    game = settings.games_folder + "MAZE"
-    if len(sys.argv) >= 2:
-        if sys.argv[1] == "--help" or sys.argv[1] == "-h":
+    arguments = sys.argv[1:]
+    is_process_mode = "--process" in arguments
+    if is_process_mode:
+        arguments.remove("--process")
+
+    game = "MAZE"
+    if arguments:
+        if arguments[0] == "--help" or arguments[0] == "-h":
             print_help()
             sys.exit(0)
-        game = sys.argv[1]
+        game = arguments[0]
+    game = library.locate(game)
 
     app = PyQt5.QtWidgets.QApplication(sys.argv)
-    chip_emulator = emulator.Emulator()
-    chip_emulator.load_file_in_memory(game)
-
-    window = EmulatorWindow(chip_emulator)
+    if is_process_mode:
+        # shared memory needs Python 3.8, the rest of the GUI runs on 3.6
+        import core_process
+        core = core_process.CoreProcess()
+        window = CoreProcessWindow(core, game)
+        window.restart_game(game)
+    else:
+        chip_emulator = emulator.Emulator()
+        chip_emulator.load_rom(library.read_rom(game))
+        window = EmulatorWindow(chip_emulator, game)
     window.show()
     sys.exit(app.exec_())
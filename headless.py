@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import blocks
+import emulator
+import library
+import profiler
+import romcache
+import settings
+
+
+class IncorrectKeyScriptException(Exception):
+    """Ошибка в сценарии нажатия клавиш"""
+    pass
+
+
+# '60:+5,90:-5' -> [(60, 0x5, True), (90, 0x5, False)]
+def parse_key_script(script):
+    events = []
+    if not script:
+        return events
+
+    for item in script.split(','):
+        try:
+            frame, action = item.strip().split(':')
+            key = int(action[1:], 16)
+            if action[0] not in '+-' or key < 0 or key > 0xf:
+                raise ValueError()
+            events.append((int(frame), key, action[0] == '+'))
+        except ValueError:
+            raise IncorrectKeyScriptException("Incorrect key event '{}'".format(item))
+
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def resolve_rom(name):
+    return library.locate(name)
+
+
+def screen_hash(chip_screen):
+    return hashlib.sha1(chip_screen.to_bytes()).hexdigest()
+
+
+def run_rom(file_name, frames=None, cycles=None, key_events=(),
+            instructions_per_frame=settings.instructions_per_frame,
+            engine="interpreter", chip_emulator=None, seed=None, profile=False,
+            cache=romcache.default_cache):
+    if frames is None and cycles is None:
+        raise ValueError("Frames or cycles count should be set")
+    if instructions_per_frame <= 0:
+        raise ValueError("Instructions per frame should be positive")
+    if profile and engine == "blocks":
+        # compiled blocks bypass opcode handlers, only terminators would be counted
+        raise ValueError("Profiling is supported by interpreter engine only")
+    if cycles is None:
+        cycles = frames * instructions_per_frame
+
+    if chip_emulator is None:
+        chip_emulator = emulator.Emulator()
+    chip_emulator.cycles_per_timer_tick = instructions_per_frame
+    chip_emulator.load_cached_rom(file_name, cache)
+    chip_emulator.seed(seed)
+
+    rom_profiler = None
+    if profile:
+        rom_profiler = profiler.Profiler(chip_emulator)
+        rom_profiler.enable()
+
+    block_engine = None
+    if engine == "blocks":
+        block_engine = blocks.BlockEngine(chip_emulator)
+
+    events = list(key_events)
+    event_index = 0
+    executed = 0
+    frame = 0
+    changed_frames = 0
+    previous_screen = chip_emulator.screen.to_bytes()
+
+    is_waiting_for_input = False
+    start_time = time.perf_counter()
+    try:
+        while executed < cycles:
+            while event_index < len(events) and events[event_index][0] <= frame:
+                _, key, is_pressed = events[event_index]
+                if is_pressed:
+                    chip_emulator.press_button(key)
+                else:
+                    chip_emulator.release_button(key)
+                event_index += 1
+
+            frames_count = 1
+            if chip_emulator.is_waiting_for_key:
+                if event_index == len(events):
+                    # nothing will ever be pressed
+                    is_waiting_for_input = True
+                    break
+                # jump straight to the frame of the next scripted event
+                frames_count = max(1, events[event_index][0] - frame)
+
+            # blocks can run past the budget, so it is counted to the frame
+            # boundary and frames are taken from really executed instructions
+            budget = min(instructions_per_frame * (frame + frames_count), cycles) - executed
+            if block_engine is not None:
+                executed += block_engine.run_cycles(budget)
+            else:
+                executed += chip_emulator.run_cycles(budget)
+            frame = executed // instructions_per_frame
+
+            current_screen = chip_emulator.screen.to_bytes()
+            if current_screen != previous_screen:
+                changed_frames += 1
+                previous_screen = current_screen
+        seconds = time.perf_counter() - start_time
+        # the last frame can be incomplete, instructions of the last block
+        # executed over the budget belong to it
+        frame = -(-min(executed, cycles) // instructions_per_frame)
+    finally:
+        # the emulator can be reused by the caller after an error
+        if block_engine is not None:
+            block_engine.detach()
+        if rom_profiler is not None:
+            rom_profiler.disable()
+
+    result = {
+        "rom": os.path.basename(file_name),
+        "engine": engine,
+        "instructions": executed,
+        "frames": frame,
+        "changed_frames": changed_frames,
+        "seconds": seconds,
+        "instructions_per_second": executed / seconds if seconds else 0.0,
+        "screen_hash": screen_hash(chip_emulator.screen),
+        "waiting_for_input": is_waiting_for_input
+    }
+    if rom_profiler is not None:
+        result["profile"] = rom_profiler.report()
+    return result
+
+
+def format_result(result):
+    return ("{rom:<10} {instructions:>10} instr {frames:>7} frames "
+            "{changed_frames:>6} changed {instructions_per_second:>12.0f} instr/s "
+            "{screen_hash}{waiting}".format(
+                waiting=" waiting for input" if result.get("waiting_for_input") else "",
+                **result))
+
+
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("{} is not a positive number".format(value))
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run CHIP-8 ROMs without GUI")
+    parser.add_argument("roms", nargs="+",
+                        help="ROM files or names of games from games/ folder")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument("-c", "--cycles", type=int, help="instructions per ROM")
+    budget.add_argument("-f", "--frames", type=int, help="60 Hz frames per ROM")
+    parser.add_argument("--ipf", type=positive_int, default=settings.instructions_per_frame,
+                        help="instructions per frame")
+    parser.add_argument("-k", "--keys", default="",
+                        help="key script: 'frame:+key,frame:-key', e.g. '60:+5,90:-5'")
+    parser.add_argument("--engine", choices=["interpreter", "blocks"],
+                        default="interpreter")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of random generator for CXNN")
+    parser.add_argument("--packed-screen", action="store_true",
+                        help="store framebuffer as one integer per row")
+    parser.add_argument("--profile", action="store_true",
+                        help="count executions and time of every opcode handler "
+                             "(interpreter engine only)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    if args.profile and args.engine == "blocks":
+        parser.error("--profile can't be used with --engine blocks")
+
+    try:
+        key_events = parse_key_script(args.keys)
+        chip_emulator = emulator.Emulator(packed_screen=args.packed_screen)
+        results = []
+        for rom in args.roms:
+            results.append(run_rom(
+                resolve_rom(rom), frames=args.frames, cycles=args.cycles,
+                key_events=key_events, instructions_per_frame=args.ipf,
+                engine=args.engine, chip_emulator=chip_emulator, seed=args.seed,
+                profile=args.profile))
+            if not args.json:
+                print(format_result(results[-1]))
+                if args.profile:
+                    print(profiler.format_report(results[-1]["profile"]) + "\n")
+    except (IncorrectKeyScriptException, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import collections
+import time
+
+import settings
+
+
+class Keypad:
+    keys_count = 16
+
+    def __init__(self, max_events=settings.keypad_queue_size,
+                 max_latency_samples=settings.keypad_latency_samples):
+        # bit k is set while key k is held
+        self.state = 0
+        # the last pressed key, consumed by FX0A
+        self.last_pressed = None
+        # keys which were released before EX9E/EXA1/FX0A looked at them are still
+        # reported as pressed once, so short taps are not lost
+        self.latched = 0
+        self._unobserved = 0
+
+        # (timestamp, key, is_pressed) pushed by GUI thread; append and popleft
+        # of deque are atomic, so no lock is needed
+        self._events = collections.deque()
+        self.max_events = max_events
+        # presses rejected because the queue was full; releases are never
+        # rejected, otherwise a key would stay held
+        self.dropped_presses = 0
+
+        # key -> time of press which was not read by EX9E/EXA1/FX0A yet
+        self._unread = {}
+        # times of presses which were not followed by a draw yet
+        self._undrawn = []
+        self.read_latencies = collections.deque(maxlen=max_latency_samples)
+        self.draw_latencies = collections.deque(maxlen=max_latency_samples)
+
+    def reset(self):
+        self.state = 0
+        self.last_pressed = None
+        self.latched = 0
+        self._unobserved = 0
+        self._events.clear()
+        self.dropped_presses = 0
+        self._unread.clear()
+        self._undrawn.clear()
+
+    def push(self, key, is_pressed):
+        # can be called from any thread, applied by drain
+        if is_pressed and len(self._events) >= self.max_events:
+            self.dropped_presses += 1
+            return
+        self._events.append((time.perf_counter(), key, is_pressed))
+
+    def has_events(self):
+        return bool(self._events)
+
+    def drain(self):
+        # applies pushed events, returns them as (key, is_pressed)
+        applied = []
+        while self._events:
+            timestamp, key, is_pressed = self._events.popleft()
+            if is_pressed:
+                self._unread.setdefault(key, timestamp)
+                self._undrawn.append(timestamp)
+                self.press(key)
+            else:
+                self.release(key)
+            applied.append((key, is_pressed))
+        return applied
+
+    def press(self, key):
+        self.state |= 1 << key
+        self._unobserved |= 1 << key
+        self.last_pressed = key
+
+    def release(self, key):
+        bit = 1 << key
+        self.state &= ~bit
+        if self._unobserved & bit:
+            self.latched |= bit
+        elif self.last_pressed == key:
+            self.last_pressed = None
+
+    def is_pressed(self, key):
+        if self._unread:
+            self._observe(key)
+        bit = 1 << key
+        is_pressed = (self.state | self.latched) & bit
+        if self._unobserved & bit:
+            self._unobserved &= ~bit
+            self.latched &= ~bit
+        return is_pressed >> key
+
+    def take_pressed(self):
+        key = self.last_pressed
+        if key is not None:
+            if self._unread:
+                self._observe(key)
+            self._unobserved &= ~(1 << key)
+            self.latched &= ~(1 << key)
+            self.last_pressed = None
+        return key
+
+    def mark_drawn(self):
+        if self._undrawn:
+            now = time.perf_counter()
+            self.draw_latencies.extend(now - timestamp for timestamp in self._undrawn)
+            self._undrawn.clear()
+
+    def _observe(self, key):
+        timestamp = self._unread.pop(key, None)
+        if timestamp is not None:
+            self.read_latencies.append(time.perf_counter() - timestamp)
+
+    def latency_report(self):
+        report = {}
+        for name, latencies in (("read", self.read_latencies), ("draw", self.draw_latencies)):
+            latencies = sorted(latencies)
+            report[name + "_samples"] = len(latencies)
+            if not latencies:
+                continue
+
+            def percentile(part):
+                return latencies[min(len(latencies) - 1, int(part * len(latencies)))]
+
+            report["p50_" + name + "_latency"] = percentile(0.5)
+            report["p99_" + name + "_latency"] = percentile(0.99)
+            report["max_" + name + "_latency"] = latencies[-1]
+        return report
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import settings
+
+
+class RomEntry:
+    def __init__(self, rom_id, name, source, path, size, sha1,
+                 description="", controls=()):
+        # "games/NAME" or "chip8.zip/games/NAME"
+        self.id = rom_id
+        self.name = name
+        # "folder" or "archive"
+        self.source = source
+        # file name in games folder or member name in archive
+        self.path = path
+        self.size = size
+        self.sha1 = sha1
+        self.description = description
+        self.controls = list(controls)
+
+    def to_json(self):
+        return {"id": self.id, "name": self.name, "source": self.source,
+                "path": self.path, "size": self.size, "sha1": self.sha1,
+                "description": self.description, "controls": self.controls}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["id"], data["name"], data["source"], data["path"],
+                   data["size"], data["sha1"], data["description"], data["controls"])
+
+
+def normalize_name(name):
+    return name.replace(" ", "").upper()
+
+
+def parse_descriptions(text):
+    # "## NAME" sections of GAMES.md -> (description, controls)
+    games = {}
+    description = controls = None
+    is_controls = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("## "):
+            description, controls = [], []
+            games[normalize_name(line[3:])] = (description, controls)
+            is_controls = False
+        elif description is None or not line:
+            continue
+        elif line.startswith("Управление"):
+            is_controls = True
+        elif is_controls:
+            if line.startswith("*"):
+                controls.append(line[1:].strip())
+        else:
+            description.append(line)
+    return {name: (" ".join(description), controls)
+            for name, (description, controls) in games.items()}
+
+
+class RomLibrary:
+    index_version = 1
+
+    def __init__(self, games_folder=settings.games_folder,
+                 archive_file=settings.archive_file,
+                 description_file=settings.games_description_file,
+                 index_file=settings.library_index_file):
+        self.games_folder = games_folder
+        self.archive_file = archive_file
+        self.description_file = description_file
+        self.index_file = index_file
+
+        self.entries = []
+        # id, name and sha1 -> entry, games folder wins over archive
+        self._keys = {}
+        self._archive = None
+
+    def load(self):
+        # returns True if ROMs were scanned, False if the index was up to date
+        signature = self._signature()
+        index = self._read_index()
+        if index is not None and index.get("version") == self.index_version and \
+                index.get("signature") == signature:
+            self._set_entries(RomEntry.from_json(item) for item in index["entries"])
+            return False
+
+        self.scan()
+        self._write_index(signature)
+        return True
+
+    def scan(self):
+        descriptions = {}
+        if self.description_file and os.path.isfile(self.description_file):
+            with open(self.description_file, encoding='utf-8') as f:
+                descriptions = parse_descriptions(f.read())
+
+        entries = []
+        for name in self._folder_names():
+            with open(os.path.join(self.games_folder, name), 'rb') as f:
+                data = f.read()
+            entries.append(self._make_entry("games/" + name, name, "folder", name, data,
+                                            descriptions))
+        if self._has_archive():
+            archive = self._get_archive()
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                if self._is_archive_rom(info):
+                    name = os.path.basename(info.filename)
+                    entries.append(self._make_entry(
+                        os.path.basename(self.archive_file) + "/" + info.filename,
+                        name, "archive", info.filename, archive.read(info), descriptions))
+        self._set_entries(entries)
+
+    def resolve(self, key):
+        entry = self._keys.get(key) or self._keys.get(normalize_name(key)) or \
+            self._keys.get(key.lower())
+        if entry is None:
+            raise FileNotFoundError("Can't find a ROM {}".format(key))
+        return entry
+
+    def locate(self, key):
+        # path of a file in games folder or id of a ROM from archive
+        entry = self.resolve(key)
+        if entry.source == "folder":
+            return os.path.join(self.games_folder, entry.path)
+        return entry.id
+
+    def read(self, entry):
+        if entry.source == "folder":
+            with open(os.path.join(self.games_folder, entry.path), 'rb') as f:
+                return f.read()
+        return self._get_archive().read(entry.path)
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def _set_entries(self, entries):
+        self.entries = list(entries)
+        self._keys = {}
+        for entry in self.entries:
+            for key in (entry.id, normalize_name(entry.name), entry.sha1):
+                self._keys.setdefault(key, entry)
+
+    @staticmethod
+    def _make_entry(rom_id, name, source, path, data, descriptions):
+        description, controls = descriptions.get(normalize_name(name), ("", []))
+        return RomEntry(rom_id, name, source, path, len(data),
+                        hashlib.sha1(data).hexdigest(), description, controls)
+
+    def _folder_names(self):
+        if not os.path.isdir(self.games_folder):
+            return []
+        return sorted(name for name in os.listdir(self.games_folder)
+                      if not name.startswith('_') and
+                      os.path.isfile(os.path.join(self.games_folder, name)))
+
+    @staticmethod
+    def _is_archive_rom(info):
+        return info.filename.startswith("games/") and not info.is_dir() and \
+            not os.path.basename(info.filename).startswith('_')
+
+    def _has_archive(self):
+        return bool(self.archive_file) and os.path.isfile(self.archive_file)
+
+    def _get_archive(self):
+        # archive is opened on first use and members are read from it on demand
+        if self._archive is None:
+            self._archive = zipfile.ZipFile(self.archive_file)
+        return self._archive
+
+    def _signature(self):
+        def stat(path):
+            if not path or not os.path.isfile(path):
+                return None
+            info = os.stat(path)
+            return [info.st_size, info.st_mtime_ns]
+
+        return {
+            "games": [[name, stat(os.path.join(self.games_folder, name))]
+                      for name in self._folder_names()],
+            "archive": stat(self.archive_file),
+            "description": stat(self.description_file)
+        }
+
+    def _read_index(self):
+        if not self.index_file:
+            return None
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, signature):
+        if not self.index_file:
+            return
+        index = {"version": self.index_version, "signature": signature,
+                 "entries": [entry.to_json() for entry in self.entries]}
+        try:
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+        except OSError:
+            pass
+
+
+_default_library = None
+
+
+def default_library():
+    global _default_library
+    if _default_library is None:
+        _default_library = RomLibrary()
+        _default_library.load()
+    return _default_library
+
+
+def locate(name):
+    if os.path.isfile(name):
+        return name
+    return default_library().locate(name)
+
+
+def read_rom(name):
+    if os.path.isfile(name):
+        with open(name, 'rb') as f:
+            return f.read()
+    rom_library = default_library()
+    return rom_library.read(rom_library.resolve(name))
@@ -12,10 +12,18 @@ class Memory:
     def __init__(self):
         self.memory_size = 4096
         self._memory = bytearray(self.memory_size)
+        self._view = memoryview(self._memory)
+        self._zero_program = bytes(self.memory_size - 0x200)
+        # callables (start_address, length) notified about every write
+        self.write_listeners = []
 
     def reset(self):
-        for i in range(0x200, self.memory_size, 1):
-            self._memory[i] = 0
+        self._memory[0x200:] = self._zero_program
+        self._notify_write(0x200, self.memory_size - 0x200)
+
+    def _notify_write(self, start_address, length):
+        for listener in self.write_listeners:
+            listener(start_address, length)
 
     def read_byte(self, address):
         if address < 0 or address >= self.memory_size:
@@ -26,15 +34,26 @@ class Memory:
         if address < 0 or address >= self.memory_size:
             raise IncorrectAddressException()
         self._memory[address] = byte
+        self._notify_write(address, 1)
 
     def load_data(self, start_address, data):
         if start_address < 0 or start_address >= self.memory_size:
             raise IncorrectAddressException()
 
-        for offset, byte in enumerate(data):
-            if start_address + offset >= self.memory_size:
-                raise MemoryOverflowException()
-            self._memory[start_address + offset] = byte
+        length = len(data)
+        if start_address + length > self.memory_size:
+            raise MemoryOverflowException()
+        self._memory[start_address:start_address + length] = data
+        self._notify_write(start_address, length)
+
+    def load_image(self, data):
+        if len(data) != self.memory_size:
+            raise MemoryOverflowException()
+        self._memory[:] = data
+        self._notify_write(0, self.memory_size)
+
+    def to_bytes(self):
+        return bytes(self._memory)
 
     def read_opcode(self, address):
         high_byte = self._memory[address] << 8
@@ -48,3 +67,11 @@ class Memory:
             raise IncorrectAddressException()
 
         return self._memory[start_address:start_address + length]
+
+    def view(self, start_address, length):
+        if start_address < 0 or length < 0 or \
+                start_address >= self.memory_size or \
+                start_address + length >= self.memory_size:
+            raise IncorrectAddressException()
+
+        return self._view[start_address:start_address + length]
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+import time
+
+import emulator
+import headless
+import library
+import settings
+
+
+class IncorrectMovieException(Exception):
+    """Файл записи поврежден или имеет другую версию"""
+    pass
+
+
+class Movie:
+    magic = b'C8MV'
+    # keys are replayed into the keypad bitmask since version 2
+    version = 2
+    # magic, version, seed, cycles per timer tick, ROM sha1, ROM name length
+    _header = struct.Struct('>4sBQI20sH')
+    # length in cycles, events count
+    _counts = struct.Struct('>QI')
+    # cycle, key, is pressed
+    _event = struct.Struct('>QBB')
+
+    def __init__(self, rom_name, rom_data, seed,
+                 cycles_per_timer_tick=settings.instructions_per_frame):
+        self.rom_name = rom_name
+        self.rom_hash = hashlib.sha1(rom_data).digest()
+        self.seed = seed
+        self.cycles_per_timer_tick = cycles_per_timer_tick
+        # (cycle, key, is_pressed) in order of cycles
+        self.events = []
+        self.cycles = 0
+        self.screen_hash = bytes(20)
+
+    def to_bytes(self):
+        name = self.rom_name.encode('utf-8')
+        return b''.join([
+            self._header.pack(self.magic, self.version, self.seed,
+                              self.cycles_per_timer_tick, self.rom_hash, len(name)),
+            name,
+            self._counts.pack(self.cycles, len(self.events)),
+            b''.join(self._event.pack(*event) for event in self.events),
+            self.screen_hash
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            magic, version, seed, cycles_per_timer_tick, rom_hash, name_length = \
+                cls._header.unpack_from(data)
+            if magic != cls.magic or version != cls.version:
+                raise IncorrectMovieException("Unsupported movie format")
+            offset = cls._header.size
+            name = bytes(data[offset:offset + name_length]).decode('utf-8')
+            offset += name_length
+            cycles, events_count = cls._counts.unpack_from(data, offset)
+            offset += cls._counts.size
+            events = [cls._event.unpack_from(data, offset + i * cls._event.size)
+                      for i in range(events_count)]
+            offset += events_count * cls._event.size
+            screen_hash = bytes(data[offset:offset + 20])
+        except (struct.error, UnicodeDecodeError):
+            raise IncorrectMovieException("Movie is damaged")
+        if len(screen_hash) != 20:
+            raise IncorrectMovieException("Movie is damaged")
+
+        movie = cls(name, b'', seed, cycles_per_timer_tick)
+        movie.rom_hash = rom_hash
+        movie.events = [(cycle, key, bool(is_pressed)) for cycle, key, is_pressed in events]
+        movie.cycles = cycles
+        movie.screen_hash = screen_hash
+        return movie
+
+    def save(self, file_name):
+        with open(file_name, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def screen_digest(chip_screen):
+    return hashlib.sha1(chip_screen.to_bytes()).digest()
+
+
+class MovieRecorder:
+    def __init__(self, chip_emulator, rom_name, rom_data, seed=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.emulator = chip_emulator
+        self.movie = Movie(rom_name, rom_data, seed, chip_emulator.cycles_per_timer_tick)
+        self._start_cycle = chip_emulator.cycles
+        chip_emulator.seed(seed)
+
+    def add_event(self, key, is_pressed):
+        # event which is already applied to the emulator
+        self.movie.events.append((self.emulator.cycles - self._start_cycle, key, is_pressed))
+
+    def press_button(self, key):
+        self.add_event(key, True)
+        self.emulator.press_button(key)
+
+    def release_button(self, key):
+        self.add_event(key, False)
+        self.emulator.release_button(key)
+
+    def stop(self):
+        self.movie.cycles = self.emulator.cycles - self._start_cycle
+        self.movie.screen_hash = screen_digest(self.emulator.screen)
+        return self.movie
+
+
+def replay(movie, rom_data, chip_emulator=None):
+    if hashlib.sha1(rom_data).digest() != movie.rom_hash:
+        raise IncorrectMovieException("Movie was recorded with another ROM")
+
+    if chip_emulator is None:
+        chip_emulator = emulator.Emulator()
+    chip_emulator.cycles_per_timer_tick = movie.cycles_per_timer_tick
+    chip_emulator.reset()
+    chip_emulator.seed(movie.seed)
+    chip_emulator.load_rom(rom_data)
+
+    # framebuffer digest for every timer tick
+    frames = []
+    events = movie.events
+    event_index = 0
+    while chip_emulator.cycles < movie.cycles:
+        while event_index < len(events) and events[event_index][0] <= chip_emulator.cycles:
+            _, key, is_pressed = events[event_index]
+            if is_pressed:
+                chip_emulator.press_button(key)
+            else:
+                chip_emulator.release_button(key)
+            event_index += 1
+
+        end = min(movie.cycles, chip_emulator.cycles + chip_emulator.cycles_per_timer_tick -
+                  chip_emulator.cycles % chip_emulator.cycles_per_timer_tick)
+        if event_index < len(events):
+            end = min(end, events[event_index][0])
+        chip_emulator.run_cycles(end - chip_emulator.cycles)
+        if chip_emulator.cycles % chip_emulator.cycles_per_timer_tick == 0:
+            frames.append(screen_digest(chip_emulator.screen))
+
+    return frames, screen_digest(chip_emulator.screen) == movie.screen_hash
+
+
+def record(rom_file, frames, key_events=(), seed=0):
+    rom_data = library.read_rom(rom_file)
+    chip_emulator = emulator.Emulator()
+    chip_emulator.load_rom(rom_data)
+    recorder = MovieRecorder(chip_emulator, os.path.basename(rom_file), rom_data, seed)
+
+    events = list(key_events)
+    event_index = 0
+    for frame in range(frames):
+        while event_index < len(events) and events[event_index][0] <= frame:
+            _, key, is_pressed = events[event_index]
+            if is_pressed:
+                recorder.press_button(key)
+            else:
+                recorder.release_button(key)
+            event_index += 1
+        chip_emulator.run_cycles(chip_emulator.cycles_per_timer_tick)
+    return recorder.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay CHIP-8 movies")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    record_parser = commands.add_parser("record", help="record scripted input")
+    record_parser.add_argument("rom", help="ROM file or name of game from games/ folder")
+    record_parser.add_argument("movie", help="movie file")
+    record_parser.add_argument("-f", "--frames", type=int, required=True)
+    record_parser.add_argument("-k", "--keys", default="",
+                               help="key script: 'frame:+key,frame:-key'")
+    record_parser.add_argument("--seed", type=int, default=0)
+
+    replay_parser = commands.add_parser("replay", help="replay movie at full speed")
+    replay_parser.add_argument("movie", help="movie file")
+    replay_parser.add_argument("--rom", help="ROM file, name from movie by default")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "record":
+            movie = record(headless.resolve_rom(args.rom), args.frames,
+                           headless.parse_key_script(args.keys), args.seed)
+            movie.save(args.movie)
+            print("{} cycles, {} events".format(movie.cycles, len(movie.events)))
+            return 0
+
+        movie = Movie.load(args.movie)
+        rom_data = library.read_rom(headless.resolve_rom(args.rom or movie.rom_name))
+        start_time = time.perf_counter()
+        frames, is_same = replay(movie, rom_data)
+        seconds = time.perf_counter() - start_time
+    except (IncorrectMovieException, headless.IncorrectKeyScriptException,
+            FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print("{} cycles, {} frames in {:.3f} s ({:.0f}x real time), final screen {}".format(
+        movie.cycles, len(frames), seconds,
+        len(frames) / settings.timer_frequency / seconds if seconds else 0,
+        "matches" if is_same else "DIFFERS"))
+    return 0 if is_same else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
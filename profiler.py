@@ -0,0 +1,99 @@
+import collections
+import json
+import time
+
+import emulator
+
+
+class Profiler:
+    def __init__(self, chip_emulator):
+        self.emulator = chip_emulator
+        # handler name -> [executions count, total seconds]
+        self.handlers = collections.defaultdict(lambda: [0, 0.0])
+        self.addresses = collections.Counter()
+        self.is_enabled = False
+        self._skip_idle_loops = True
+
+    def enable(self):
+        # profiled step shadows Emulator.make_tact only for this instance,
+        # so disabled profiler costs nothing
+        if not self.is_enabled:
+            self.emulator.make_tact = self._make_tact
+            # every executed instruction is counted, so idle loops are not skipped
+            self._skip_idle_loops = self.emulator.skip_idle_loops
+            self.emulator.skip_idle_loops = False
+            self.is_enabled = True
+
+    def disable(self):
+        if self.is_enabled:
+            del self.emulator.make_tact
+            self.emulator.skip_idle_loops = self._skip_idle_loops
+            self.is_enabled = False
+
+    def reset(self):
+        self.handlers.clear()
+        self.addresses.clear()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+    def _make_tact(self):
+        chip_emulator = self.emulator
+        address = chip_emulator.memory_pointer
+        handler = chip_emulator._decode_table[chip_emulator.memory.read_opcode(address)][0]
+
+        start_time = time.perf_counter()
+        emulator.Emulator.make_tact(chip_emulator)
+        elapsed = time.perf_counter() - start_time
+
+        stats = self.handlers[handler.__name__]
+        stats[0] += 1
+        stats[1] += elapsed
+        self.addresses[address] += 1
+
+    def report(self, top_addresses=20):
+        total_count = sum(count for count, _ in self.handlers.values())
+        total_time = sum(seconds for _, seconds in self.handlers.values())
+        handlers = [
+            {
+                "handler": name,
+                "count": count,
+                "seconds": seconds,
+                "count_share": count / total_count if total_count else 0.0,
+                "time_share": seconds / total_time if total_time else 0.0
+            }
+            for name, (count, seconds) in sorted(
+                self.handlers.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+        addresses = [{"address": address, "count": count}
+                     for address, count in self.addresses.most_common(top_addresses)]
+        return {
+            "instructions": total_count,
+            "seconds": total_time,
+            "handlers": handlers,
+            "addresses": addresses
+        }
+
+    def to_json(self, top_addresses=20):
+        return json.dumps(self.report(top_addresses), indent=2)
+
+    def to_text(self, top_addresses=20):
+        return format_report(self.report(top_addresses))
+
+
+def format_report(report):
+    lines = ["{:<14} {:>10} {:>7} {:>10} {:>7}".format(
+        "handler", "count", "count%", "seconds", "time%")]
+    for item in report["handlers"]:
+        lines.append("{:<14} {:>10} {:>6.1f}% {:>10.4f} {:>6.1f}%".format(
+            item["handler"], item["count"], item["count_share"] * 100,
+            item["seconds"], item["time_share"] * 100))
+    lines.append("")
+    lines.append("{:<14} {:>10}".format("address", "count"))
+    for item in report["addresses"]:
+        lines.append("0x{:03x}{:<9} {:>10}".format(item["address"], "", item["count"]))
+    return "\n".join(lines)
@@ -0,0 +1,93 @@
+import collections
+import zlib
+
+import settings
+
+
+def xor_bytes(first, second):
+    return (int.from_bytes(first, 'big') ^ int.from_bytes(second, 'big')).to_bytes(len(first), 'big')
+
+
+class _Group:
+    def __init__(self, keyframe):
+        # compressed full state and compressed deltas of the following frames
+        self.keyframe = keyframe
+        self.deltas = []
+        self.size = len(keyframe)
+
+
+class RewindBuffer:
+    def __init__(self, max_size=settings.rewind_buffer_size,
+                 keyframe_interval=settings.rewind_keyframe_interval,
+                 compression_level=1):
+        self.max_size = max_size
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+
+        self.size = 0
+        self._groups = collections.deque()
+        # uncompressed keyframe of the last group
+        self._keyframe = None
+
+    def __len__(self):
+        return sum(1 + len(group.deltas) for group in self._groups)
+
+    def clear(self):
+        self.size = 0
+        self._groups.clear()
+        self._keyframe = None
+
+    @staticmethod
+    def _split(chip_emulator, state):
+        # random generator, registers, memory and screen have the same size
+        # in every state, header and stack are stored as is
+        tail_size = chip_emulator.random_state_size + len(chip_emulator.registers) + \
+            chip_emulator.memory.memory_size + chip_emulator.screen.size
+        return state[:-tail_size], state[-tail_size:]
+
+    def record(self, chip_emulator):
+        state = chip_emulator.save_state()
+
+        if not self._groups or len(self._groups[-1].deltas) + 1 >= self.keyframe_interval:
+            group = _Group(zlib.compress(state, self.compression_level))
+            self._groups.append(group)
+            self._keyframe = state
+            self.size += group.size
+        else:
+            group = self._groups[-1]
+            if self._keyframe is None:
+                self._keyframe = zlib.decompress(group.keyframe)
+            head, tail = self._split(chip_emulator, state)
+            _, keyframe_tail = self._split(chip_emulator, self._keyframe)
+            delta = zlib.compress(xor_bytes(tail, keyframe_tail), self.compression_level)
+            group.deltas.append((head, delta))
+            size = len(head) + len(delta)
+            group.size += size
+            self.size += size
+
+        while self.size > self.max_size and len(self._groups) > 1:
+            self.size -= self._groups.popleft().size
+
+    def rewind(self, chip_emulator):
+        if not self._groups:
+            return False
+
+        group = self._groups[-1]
+        if self._keyframe is None:
+            self._keyframe = zlib.decompress(group.keyframe)
+
+        if group.deltas:
+            head, delta = group.deltas.pop()
+            _, keyframe_tail = self._split(chip_emulator, self._keyframe)
+            state = head + xor_bytes(zlib.decompress(delta), keyframe_tail)
+            size = len(head) + len(delta)
+        else:
+            self._groups.pop()
+            state = self._keyframe
+            self._keyframe = None
+            size = len(group.keyframe)
+        group.size -= size
+        self.size -= size
+
+        chip_emulator.load_state(state)
+        return True
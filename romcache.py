@@ -0,0 +1,65 @@
+import collections
+import hashlib
+
+import library
+import settings
+
+
+def read_file(file_name):
+    with open(file_name, 'rb') as f:
+        return f.read()
+
+
+class RomCache:
+    def __init__(self, max_size=settings.rom_cache_size, read=read_file):
+        self.max_size = max_size
+        self.read = read
+        # path -> sha1 of the file content
+        self._hashes = {}
+        # sha1 -> pristine memory image, least recently used first
+        self._images = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, file_name):
+        return self._hashes.get(file_name) in self._images
+
+    def clear(self):
+        self._hashes.clear()
+        self._images.clear()
+
+    def invalidate(self, file_name):
+        self._hashes.pop(file_name, None)
+
+    def get_image(self, file_name, make_image):
+        digest = self._hashes.get(file_name)
+        image = self._images.get(digest)
+        if image is not None:
+            self._images.move_to_end(digest)
+            return image
+
+        try:
+            data = self.read(file_name)
+        except Exception:
+            raise BlockingIOError("Can't read a file {}".format(file_name))
+        digest = hashlib.sha1(data).hexdigest()
+        self._hashes[file_name] = digest
+
+        # the same ROM can be found by several paths
+        image = self._images.get(digest)
+        if image is None:
+            image = bytes(make_image(data))
+            self._images[digest] = image
+            while len(self._images) > self.max_size:
+                evicted, _ = self._images.popitem(last=False)
+                for path in [path for path, value in self._hashes.items() if value == evicted]:
+                    del self._hashes[path]
+        else:
+            self._images.move_to_end(digest)
+        return image
+
+
+# cache shared by headless runs of one process, ROMs are found by path,
+# name or hash in the library
+default_cache = RomCache(read=library.read_rom)
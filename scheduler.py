@@ -0,0 +1,87 @@
+import time
+
+import settings
+
+
+class FrameScheduler:
+    def __init__(self, parent_emulator,
+                 instructions_per_frame=settings.instructions_per_frame,
+                 frame_rate=settings.timer_frequency,
+                 spin_time=0.002, max_jitter_samples=600):
+        self.emulator = parent_emulator
+        self.instructions_per_frame = instructions_per_frame
+        self.frame_time = 1 / frame_rate
+        # the last part of waiting is done by spinning, because sleep can oversleep
+        self.spin_time = spin_time
+        self.max_jitter_samples = max_jitter_samples
+
+        self.frames = 0
+        self.late_frames = 0
+        self.jitters = []
+        self._deadline = None
+
+    def run_frame(self):
+        draws_count = self.emulator.draws_count
+        self.emulator.run_cycles(self.instructions_per_frame)
+        self.emulator.screen.publish()
+        self.frames += 1
+        if self.emulator.draws_count == draws_count:
+            return False
+        self.emulator.keypad.mark_drawn()
+        return True
+
+    def wait_next_frame(self):
+        now = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += self.frame_time
+
+        if now > self._deadline:
+            # emulation is too slow, so start pacing again from now
+            self.late_frames += 1
+            self._deadline = now
+            return
+
+        sleep_time = self._deadline - now - self.spin_time
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        while True:
+            now = time.perf_counter()
+            if now >= self._deadline:
+                break
+
+        self.jitters.append(now - self._deadline)
+        if len(self.jitters) > self.max_jitter_samples:
+            del self.jitters[:len(self.jitters) - self.max_jitter_samples]
+
+    def wait_for_input(self, event, timeout=None):
+        # emulator is blocked on FX0A, so the thread sleeps until the event is set
+        # and emulated time is advanced by the whole frames passed meanwhile
+        start_time = time.perf_counter()
+        is_set = event.wait(timeout)
+        frames = int((time.perf_counter() - start_time) / self.frame_time)
+        if frames:
+            self.emulator.run_cycles(frames * self.instructions_per_frame)
+            self.frames += frames
+        self._deadline = start_time + frames * self.frame_time
+        return is_set
+
+    def reset_pacing(self):
+        self._deadline = None
+
+    def jitter_report(self):
+        jitters = sorted(self.jitters)
+        if not jitters:
+            return {"frames": self.frames, "late_frames": self.late_frames}
+
+        def percentile(part):
+            return jitters[min(len(jitters) - 1, int(part * len(jitters)))]
+
+        return {
+            "frames": self.frames,
+            "late_frames": self.late_frames,
+            "mean_jitter": sum(jitters) / len(jitters),
+            "p50_jitter": percentile(0.5),
+            "p99_jitter": percentile(0.99),
+            "max_jitter": jitters[-1]
+        }
@@ -1,3 +1,8 @@
+# b'0' -> 0x0, b'1' -> 0x1 and back
+_CHARS_TO_PIXELS = bytes.maketrans(b'01', b'\x00\x01')
+_PIXELS_TO_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+
+
 class InvalidCoordinatesException(Exception):
     """Ошибка при попытке обратиться к несуществующей координате"""
     pass
@@ -10,6 +15,66 @@ class Screen:
         self.size = self.height * self.width
 
         self._screen = bytearray(self.size)
+        # (x, y, width, height) rectangles changed since the last take_dirty_regions
+        self._dirty_regions = [self._full_region()]
+        self.max_dirty_regions = 64
+
+        # the last published frame, one byte per pixel. Two preallocated buffers
+        # are swapped by publish, so a reader from another thread never sees
+        # a half drawn frame while it is done with the frame before the next publish
+        self.front = bytearray(self.size)
+        self._back = bytearray(self.size)
+        self.frames_published = 0
+        # publish after every change instead of frame boundaries only
+        self.publish_on_draw = False
+        # bit y is set if row y was changed since the last publish, and
+        # since the publish before it, when the back buffer was front
+        self._changed_rows = 0
+        self._stale_rows = 0
+
+    def _full_region(self):
+        return 0, 0, self.width, self.height
+
+    def _mark_dirty(self, x, y, width, height):
+        if x >= self.width or y >= self.height or height <= 0:
+            return
+        height = min(height, self.height - y)
+        self._changed_rows |= ((1 << height) - 1) << y
+        regions = self._dirty_regions
+        if len(regions) >= self.max_dirty_regions:
+            self._dirty_regions = [self._full_region()]
+        else:
+            regions.append((x, y, min(width, self.width - x), height))
+        if self.publish_on_draw:
+            self.publish()
+
+    def publish(self):
+        if not self._changed_rows:
+            return False
+        # the back buffer holds the frame published two times ago, so only
+        # rows changed since then are redrawn
+        rows = self._changed_rows | self._stale_rows
+        back = self._back
+        width = self.width
+        y = 0
+        while rows:
+            if rows & 1:
+                back[y * width:(y + 1) * width] = self._get_row(y)
+            rows >>= 1
+            y += 1
+
+        self.front, self._back = back, self.front
+        self._stale_rows = self._changed_rows
+        self._changed_rows = 0
+        self.frames_published += 1
+        return True
+
+    def _get_row(self, y):
+        return self._screen[y * self.width:(y + 1) * self.width]
+
+    def take_dirty_regions(self):
+        regions, self._dirty_regions = self._dirty_regions, []
+        return regions
 
     def set_value(self, x, y, value):
         if x >= self.width or y >= self.height or x < 0 or y < 0:
@@ -23,6 +88,7 @@ class Screen:
             raise ValueError("Value can be only 0 or 1")
 
         self._screen[index] = value
+        self._mark_dirty(x, y, 1, 1)
 
     def get_value(self, x, y):
         index = self._get_index(x, y)
@@ -30,6 +96,24 @@ class Screen:
 
     def reset(self):
         self._screen = bytearray(self.size)
+        self._mark_dirty(*self._full_region())
+
+    def to_bytes(self):
+        return bytes(self._screen)
+
+    # one byte per pixel buffer, without copying if it's possible
+    def get_buffer(self):
+        return self._screen
+
+    def load_bytes(self, data):
+        if len(data) != self.size:
+            raise ValueError("Data size must be {}".format(self.size))
+        self._screen = bytearray(data)
+        self._mark_dirty(*self._full_region())
+
+    def to_packed_bytes(self):
+        pixels = self.to_bytes().translate(_PIXELS_TO_CHARS)
+        return int(pixels, 2).to_bytes(self.size // 8, 'big')
 
     @staticmethod
     def decode_byte_to_pixels(byte):
@@ -66,4 +150,73 @@ class Screen:
                 collision |= bool(self._screen[index] & pixel)
                 self._screen[index] ^= pixel
 
+        self._mark_dirty(x, y, 8, len(data))
+        return collision
+
+
+class PackedScreen(Screen):
+    def __init__(self):
+        super().__init__()
+        # each row is one integer, the most significant bit is x = 0
+        self._rows = [0] * self.height
+        self._row_format = '0{}b'.format(self.width)
+        self._screen = None
+
+    def set_value(self, x, y, value):
+        if x >= self.width or y >= self.height or x < 0 or y < 0:
+            raise InvalidCoordinatesException()
+        if value not in {0x0, 0x1}:
+            raise ValueError("Value can be only 0 or 1")
+
+        mask = 0b1 << (self.width - 1 - x)
+        if value:
+            self._rows[y] |= mask
+        else:
+            self._rows[y] &= ~mask
+        self._mark_dirty(x, y, 1, 1)
+
+    def get_value(self, x, y):
+        y, x = divmod(self._get_index(x, y), self.width)
+        return (self._rows[y] >> (self.width - 1 - x)) & 0b1
+
+    def reset(self):
+        self._rows = [0] * self.height
+        self._mark_dirty(*self._full_region())
+
+    def to_bytes(self):
+        return b''.join(
+            format(row, self._row_format).encode().translate(_CHARS_TO_PIXELS)
+            for row in self._rows)
+
+    def get_buffer(self):
+        return self.to_bytes()
+
+    def _get_row(self, y):
+        return format(self._rows[y], self._row_format).encode().translate(_CHARS_TO_PIXELS)
+
+    def load_bytes(self, data):
+        if len(data) != self.size:
+            raise ValueError("Data size must be {}".format(self.size))
+        data = bytes(data).translate(_PIXELS_TO_CHARS)
+        self._rows = [int(data[y * self.width:(y + 1) * self.width], 2)
+                      for y in range(self.height)]
+        self._mark_dirty(*self._full_region())
+
+    def to_packed_bytes(self):
+        return b''.join(row.to_bytes(self.width // 8, 'big') for row in self._rows)
+
+    def draw_sprite(self, x, y, data):
+        collision = False
+        rows = self._rows
+        shift = self.width - 8 - x
+        for y_offset, byte in enumerate(data):
+            screen_y = y + y_offset
+            if screen_y >= self.height:
+                break
+            line = byte << shift if shift >= 0 else byte >> -shift
+            if rows[screen_y] & line:
+                collision = True
+            rows[screen_y] ^= line
+
+        self._mark_dirty(x, y, 8, len(data))
         return collision
@@ -0,0 +1,462 @@
+import argparse
+import asyncio
+import json
+import random
+import struct
+import sys
+import time
+
+import emulator
+import headless
+import memory
+import romcache
+import settings
+
+
+class IncorrectMessageException(Exception):
+    """Получено некорректное сообщение"""
+    pass
+
+
+# client -> server: load ROM (seed, name), key event (sequence, key, is pressed)
+MESSAGE_LOAD = b'L'
+MESSAGE_KEY = b'K'
+# server -> client: frame (number, last applied key sequence, delta), error text
+MESSAGE_FRAME = b'F'
+MESSAGE_ERROR = b'E'
+
+_message_header = struct.Struct('>cI')
+_load_message = struct.Struct('>q')
+_key_message = struct.Struct('>IBB')
+_frame_header = struct.Struct('>II')
+_max_message_size = 64 * 1024
+
+# packed 64x32 frame, one bit per pixel
+frame_size = 64 * 32 // 8
+
+
+def rle_encode(data):
+    # (count, byte) pairs, count is 1..255
+    result = bytearray()
+    index = 0
+    length = len(data)
+    while index < length:
+        byte = data[index]
+        end = index + 1
+        while end < length and end - index < 255 and data[end] == byte:
+            end += 1
+        result.append(end - index)
+        result.append(byte)
+        index = end
+    return bytes(result)
+
+
+def rle_decode(data):
+    if len(data) % 2:
+        raise IncorrectMessageException("Run-length data is damaged")
+    result = bytearray()
+    for index in range(0, len(data), 2):
+        result.extend(data[index + 1:index + 2] * data[index])
+    return bytes(result)
+
+
+def xor_frames(first, second):
+    return (int.from_bytes(first, 'big') ^ int.from_bytes(second, 'big')).to_bytes(
+        len(first), 'big')
+
+
+def encode_frame(previous, current):
+    return rle_encode(xor_frames(previous, current))
+
+
+def decode_frame(previous, payload):
+    delta = rle_decode(payload)
+    if len(delta) != len(previous):
+        raise IncorrectMessageException("Frame delta has wrong size")
+    return xor_frames(previous, delta)
+
+
+def pack_message(kind, payload=b''):
+    return _message_header.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    # (kind, payload) or None if connection is closed
+    try:
+        kind, length = _message_header.unpack(
+            await reader.readexactly(_message_header.size))
+        if length > _max_message_size:
+            raise IncorrectMessageException("Message is too long")
+        return kind, await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class Session:
+    def __init__(self, session_id, writer, cycles_per_frame):
+        self.id = session_id
+        self.writer = writer
+        self.emulator = emulator.Emulator(packed_screen=True,
+                                          cycles_per_timer_tick=cycles_per_frame)
+        self.cycles_per_frame = cycles_per_frame
+        self.is_loaded = False
+
+        self.frame_number = 0
+        # sequence of the last received key event and the last one applied
+        # to the emulator and reported to the client
+        self.received_sequence = 0
+        self.applied_sequence = 0
+        self.sent_sequence = 0
+        # deltas are computed against the last frame the client has got
+        self.last_sent = bytes(frame_size)
+        self.sent_frames = 0
+        self.skipped_frames = 0
+        self.sent_bytes = 0
+
+    def load(self, file_name, seed, cache):
+        self.emulator.cycles_per_timer_tick = self.cycles_per_frame
+        self.emulator.load_cached_rom(file_name, cache)
+        self.emulator.seed(seed)
+        self.frame_number = 0
+        self.is_loaded = True
+
+    def push_key(self, sequence, key, is_pressed):
+        self.emulator.keypad.push(key, is_pressed)
+        self.received_sequence = sequence
+
+    def step(self):
+        self.emulator.keypad.drain()
+        self.applied_sequence = self.received_sequence
+        self.emulator.run_cycles(self.cycles_per_frame)
+        self.frame_number += 1
+
+    def send_frame(self, high_water):
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        current = self.emulator.screen.to_packed_bytes()
+        if current == self.last_sent and self.applied_sequence == self.sent_sequence:
+            return
+        if transport.get_write_buffer_size() > high_water:
+            # the client is slow, this frame is merged into the next one
+            self.skipped_frames += 1
+            return
+
+        message = pack_message(MESSAGE_FRAME, _frame_header.pack(
+            self.frame_number & 0xFFFFFFFF, self.applied_sequence) +
+            encode_frame(self.last_sent, current))
+        self.writer.write(message)
+        self.last_sent = current
+        self.sent_sequence = self.applied_sequence
+        self.sent_frames += 1
+        self.sent_bytes += len(message)
+
+
+class SessionServer:
+    def __init__(self, cycles_per_frame=settings.instructions_per_frame,
+                 frame_rate=settings.timer_frequency,
+                 high_water=settings.server_high_water,
+                 sessions_per_yield=16, cache=romcache.default_cache):
+        self.cycles_per_frame = cycles_per_frame
+        self.frame_time = 1 / frame_rate
+        self.high_water = high_water
+        # the scheduler gives control to network handlers after this many sessions
+        self.sessions_per_yield = sessions_per_yield
+        self.cache = cache
+
+        self.sessions = {}
+        self.ticks = 0
+        self.late_ticks = 0
+        self._next_id = 0
+        self._servers = []
+        self._scheduler = None
+
+    async def start(self, host=None, port=None, unix_path=None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        self._servers.append(server)
+        if self._scheduler is None:
+            self._scheduler = asyncio.ensure_future(self.run_sessions())
+        return server
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        for session in list(self.sessions.values()):
+            session.writer.close()
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+
+    async def handle_client(self, reader, writer):
+        self._next_id += 1
+        session = Session(self._next_id, writer, self.cycles_per_frame)
+        self.sessions[session.id] = session
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                self._execute(session, *message)
+        except (IncorrectMessageException, ConnectionError) as e:
+            self._send_error(session, e)
+        finally:
+            del self.sessions[session.id]
+            writer.close()
+
+    def _execute(self, session, kind, payload):
+        if kind == MESSAGE_KEY:
+            try:
+                sequence, key, is_pressed = _key_message.unpack(payload)
+            except struct.error:
+                raise IncorrectMessageException("Key message is damaged")
+            if key > 0xF:
+                raise IncorrectMessageException("Incorrect key {}".format(key))
+            session.push_key(sequence, key, bool(is_pressed))
+        elif kind == MESSAGE_LOAD:
+            try:
+                seed, = _load_message.unpack_from(payload)
+                name = payload[_load_message.size:].decode('utf-8')
+            except (struct.error, UnicodeDecodeError):
+                raise IncorrectMessageException("Load message is damaged")
+            try:
+                session.load(headless.resolve_rom(name), None if seed < 0 else seed, self.cache)
+            except (FileNotFoundError, BlockingIOError, memory.MemoryOverflowException) as e:
+                self._send_error(session, e)
+        else:
+            raise IncorrectMessageException("Unknown message {!r}".format(kind))
+
+    @staticmethod
+    def _send_error(session, error):
+        if not session.writer.transport.is_closing():
+            message = "{}: {}".format(type(error).__name__, error)
+            session.writer.write(pack_message(MESSAGE_ERROR, message.encode('utf-8')))
+
+    async def run_sessions(self):
+        deadline = time.perf_counter()
+        while True:
+            for index, session in enumerate(list(self.sessions.values())):
+                if index and index % self.sessions_per_yield == 0:
+                    await asyncio.sleep(0)
+                if not session.is_loaded or session.id not in self.sessions:
+                    continue
+                try:
+                    session.step()
+                except Exception as e:
+                    # broken ROM closes only its own session
+                    session.is_loaded = False
+                    self._send_error(session, e)
+                    session.writer.close()
+                    continue
+                session.send_frame(self.high_water)
+            self.ticks += 1
+
+            deadline += self.frame_time
+            delay = deadline - time.perf_counter()
+            if delay < 0:
+                self.late_ticks += 1
+                deadline = time.perf_counter()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        sessions = list(self.sessions.values())
+        return {
+            "sessions": len(sessions),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "sent_frames": sum(session.sent_frames for session in sessions),
+            "skipped_frames": sum(session.skipped_frames for session in sessions),
+            "sent_bytes": sum(session.sent_bytes for session in sessions)
+        }
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.frame = bytes(frame_size)
+        self.frame_number = 0
+        self.frames = 0
+        self.received_bytes = 0
+
+        self._sequence = 0
+        # sequence -> send time of key events without a frame yet
+        self._pending_keys = {}
+        self.latencies = []
+
+    @classmethod
+    async def connect(cls, host=settings.server_host, port=settings.server_port, unix_path=None):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def load(self, name, seed=None):
+        self.writer.write(pack_message(
+            MESSAGE_LOAD, _load_message.pack(-1 if seed is None else seed) + name.encode('utf-8')))
+
+    def send_key(self, key, is_pressed):
+        self._sequence += 1
+        self._pending_keys[self._sequence] = time.perf_counter()
+        self.writer.write(pack_message(
+            MESSAGE_KEY, _key_message.pack(self._sequence, key, is_pressed)))
+        return self._sequence
+
+    async def read_frame(self):
+        # returns False if connection is closed
+        while True:
+            message = await read_message(self.reader)
+            if message is None:
+                return False
+            kind, payload = message
+            self.received_bytes += _message_header.size + len(payload)
+            if kind == MESSAGE_ERROR:
+                raise IncorrectMessageException(payload.decode('utf-8', 'replace'))
+            if kind != MESSAGE_FRAME:
+                continue
+
+            self.frame_number, sequence = _frame_header.unpack_from(payload)
+            self.frame = decode_frame(self.frame, payload[_frame_header.size:])
+            self.frames += 1
+            if self._pending_keys:
+                now = time.perf_counter()
+                for key_sequence in [s for s in self._pending_keys if s <= sequence]:
+                    self.latencies.append(now - self._pending_keys.pop(key_sequence))
+            return True
+
+    async def close(self):
+        self.writer.close()
+        if not hasattr(self.writer, "wait_closed"):
+            # Python 3.6 closes the writer without waiting
+            return
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def run_load_test(sessions, seconds, rom, key_interval=0.1,
+                        host=settings.server_host, port=settings.server_port, unix_path=None):
+    # client -> error which stopped it; clients which don't receive frames anymore
+    errors = {}
+    stopped = set()
+
+    async def receive(client, deadline):
+        try:
+            while time.perf_counter() < deadline:
+                if not await asyncio.wait_for(client.read_frame(), deadline - time.perf_counter()):
+                    return
+        except asyncio.TimeoutError:
+            pass
+        except (IncorrectMessageException, ConnectionError) as e:
+            errors[client] = str(e)
+        finally:
+            stopped.add(client)
+
+    async def press_keys(client, deadline):
+        generator = random.Random(id(client))
+        while time.perf_counter() < deadline and client not in stopped:
+            key = generator.randrange(16)
+            client.send_key(key, True)
+            await asyncio.sleep(key_interval / 2)
+            client.send_key(key, False)
+            await asyncio.sleep(key_interval / 2)
+
+    clients = []
+    try:
+        for _ in range(sessions):
+            clients.append(await Client.connect(host, port, unix_path))
+        for client in clients:
+            client.load(rom, seed=0)
+
+        start_time = time.perf_counter()
+        deadline = start_time + seconds
+        await asyncio.gather(*([receive(client, deadline) for client in clients] +
+                               [press_keys(client, deadline) for client in clients]))
+        elapsed = time.perf_counter() - start_time
+    finally:
+        for client in clients:
+            await client.close()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    frames = sum(client.frames for client in clients)
+
+    def percentile(part):
+        return latencies[min(len(latencies) - 1, int(part * len(latencies)))] if latencies else 0.0
+
+    return {
+        "sessions": sessions,
+        "failed_sessions": len(errors),
+        "errors": sorted(set(errors.values())),
+        "seconds": elapsed,
+        "frames": frames,
+        "frames_per_second": frames / elapsed if elapsed else 0.0,
+        "received_bytes": sum(client.received_bytes for client in clients),
+        "latency_samples": len(latencies),
+        "p50_latency": percentile(0.5),
+        "p99_latency": percentile(0.99),
+        "max_latency": latencies[-1] if latencies else 0.0
+    }
+
+
+async def _serve(args):
+    session_server = SessionServer(cycles_per_frame=args.ipf)
+    await session_server.start(args.host, args.port, args.unix)
+    print("Serving on {}".format(args.unix or "{}:{}".format(args.host, args.port)))
+    while True:
+        await asyncio.sleep(10)
+        print(json.dumps(session_server.stats()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many CHIP-8 sessions over sockets")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve_parser = commands.add_parser("serve", help="run session server")
+    serve_parser.add_argument("--ipf", type=headless.positive_int,
+                              default=settings.instructions_per_frame,
+                              help="instruction budget of a session per frame")
+    bench_parser = commands.add_parser("bench", help="measure throughput and latency")
+    bench_parser.add_argument("rom", nargs="?", default="BRIX")
+    bench_parser.add_argument("-n", "--sessions", type=int, default=100)
+    bench_parser.add_argument("-s", "--seconds", type=float, default=10)
+    for command_parser in (serve_parser, bench_parser):
+        command_parser.add_argument("--host", default=settings.server_host)
+        command_parser.add_argument("--port", type=int, default=settings.server_port)
+        command_parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    args = parser.parse_args(argv)
+
+    # asyncio.run appeared in Python 3.7
+    loop = asyncio.new_event_loop()
+    try:
+        if args.command == "serve":
+            loop.run_until_complete(_serve(args))
+            return 0
+        result = loop.run_until_complete(run_load_test(
+            args.sessions, args.seconds, args.rom,
+            host=args.host, port=args.port, unix_path=args.unix))
+    except KeyboardInterrupt:
+        return 0
+    except (OSError, IncorrectMessageException) as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        loop.close()
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,30 @@
 import os
 
 games_folder = os.path.dirname(__file__) + """/games/"""
+archive_file = os.path.dirname(__file__) + """/chip8.zip"""
+games_description_file = os.path.dirname(__file__) + """/GAMES.md"""
+library_index_file = os.path.dirname(__file__) + """/.library.json"""
 sounds_folder = os.path.dirname(__file__) + """/sounds/"""
 beep = "beep.wav"
 
 window_title = "CHIP-8"
-frequency = 1
+# instructions per second
+frequency = 600
 timer_frequency = 60
+instructions_per_frame = frequency // timer_frequency
 pixel_size = 12
+# bytes of compressed history and frames between full states
+rewind_buffer_size = 8 * 1024 * 1024
+rewind_keyframe_interval = 60
+# key events waiting for the next frame and latency samples kept
+keypad_queue_size = 64
+keypad_latency_samples = 600
+# session server address and bytes of unsent frames after which frames are coalesced
+server_host = "127.0.0.1"
+server_port = 8765
+server_high_water = 16 * 1024
+# pristine ROM images kept for instant restarts
+rom_cache_size = 32
 help_msg = '''CHIP-8 Emulator (версия 0.9)
 Автор: Чуприлин Андрей <leofwin98@yandex.ru>'''
 
@@ -34,6 +51,7 @@ CHIP:		PC:
 7 8 9 E		A S D F
 A 0 B F		Z X C V
 '''
+rewind_key_code = 16777219  # Backspace
 key_codes = {49: 0x1, 50: 0x2, 51: 0x3, 52: 0xc,  # english letters
              81: 0x4, 87: 0x5, 69: 0x6, 82: 0xd,
              65: 0x7, 83: 0x8, 68: 0x9, 70: 0xe,
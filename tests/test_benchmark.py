@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import benchmark
+import emulator
+import library
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_list_roms__games_folder_and_archive(self):
+        names = [name for name, _ in benchmark.list_roms()]
+        self.assertIn("games/BRIX", names)
+        self.assertIn("chip8.zip/games/BRIX", names)
+        self.assertNotIn("games/_test_file", names)
+
+    def test_run_suite__results_for_roms_and_micro_benchmarks(self):
+        results = benchmark.run_suite(cycles=100, micro_number=10, only=["MAZE"])
+        self.assertEqual({"games/MAZE", "chip8.zip/games/MAZE"}, set(results["roms"]))
+        self.assertGreater(results["roms"]["games/MAZE"]["instructions_per_second"], 0)
+        self.assertIn("Screen.draw_sprite", results["micro"])
+        if benchmark.resource is not None:
+            self.assertGreater(results["peak_rss_kb"], 0)
+
+    def test_run_rom_benchmark__waiting_instructions_are_executed(self):
+        # TICTAC waits for a key with FX0A almost all the time
+        chip_emulator = emulator.Emulator()
+        executed = []
+        chip_emulator.make_tact = lambda: (
+            executed.append(chip_emulator.memory_pointer),
+            emulator.Emulator.make_tact(chip_emulator))
+        data = library.read_rom(library.locate("TICTAC"))
+
+        benchmark.run_rom_benchmark("TICTAC", data, 1000, [], chip_emulator, "interpreter")
+        self.assertEqual(chip_emulator.cycles, len(executed))
+
+    def test_compare__slower_than_threshold__regression(self):
+        baseline = {"roms": {"A": {"instructions_per_second": 1000}},
+                    "micro": {"f": {"calls_per_second": 100}}}
+        current = {"roms": {"A": {"instructions_per_second": 850}},
+                   "micro": {"f": {"calls_per_second": 95}}}
+
+        regressions = benchmark.compare(baseline, current, threshold=0.1)
+        self.assertEqual([("roms", "A")], [item[:2] for item in regressions])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import blocks
+import emulator
+import settings
+
+
+class BlockEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.chip_emulator = emulator.Emulator()
+        self.engine = blocks.BlockEngine(self.chip_emulator)
+
+    def assert_same_state(self, expected, actual):
+        self.assertEqual(expected.registers, actual.registers)
+        self.assertEqual(expected.register_i, actual.register_i)
+        self.assertEqual(expected.memory_pointer, actual.memory_pointer)
+        self.assertEqual(expected.stack, actual.stack)
+        self.assertEqual(expected.memory._memory, actual.memory._memory)
+        self.assertEqual(expected.screen._screen, actual.screen._screen)
+
+    def test_run__same_state_as_interpreter(self):
+        for game in ["BRIX", "INVADERS", "TETRIS", "PONG"]:
+            reference = emulator.Emulator()
+            reference.load_file_in_memory(settings.games_folder + game)
+            self.chip_emulator.reset()
+            self.chip_emulator.load_file_in_memory(settings.games_folder + game)
+
+            self.chip_emulator.seed(game)
+            executed = self.engine.run(20000)
+            reference.seed(game)
+            for i in range(executed):
+                reference.make_tact()
+
+            self.assert_same_state(reference, self.chip_emulator)
+
+    def test_step__registers_in_block(self):
+        program = bytes([0x61, 0xf0, 0x62, 0x20, 0x81, 0x24, 0x12, 0x00])
+        self.chip_emulator.memory.load_data(0x200, program)
+
+        self.assertEqual(4, self.engine.step())
+
+        self.assertEqual(0x10, self.chip_emulator.registers[1])
+        self.assertEqual(1, self.chip_emulator.registers[0xF])
+        self.assertEqual(0x200, self.chip_emulator.memory_pointer)
+
+    def test_step__memory_write__invalidate_block(self):
+        # V0 = 1; jump 0x200, then write "V0 = 2" over the first command
+        self.chip_emulator.memory.load_data(0x200, bytes([0x60, 0x01, 0x12, 0x00]))
+        self.engine.step()
+        self.assertIn(0x200, self.engine.blocks)
+
+        self.chip_emulator.memory.load_data(0x200, bytes([0x60, 0x02]))
+        self.assertNotIn(0x200, self.engine.blocks)
+
+        self.engine.step()
+        self.assertEqual(2, self.chip_emulator.registers[0])
+
+    def test_invalidate__only_overlapping_blocks(self):
+        # 200: V0 = 1; V1 = 2; JP 200; 206: JP 206
+        self.chip_emulator.memory.load_data(0x200, bytes([0x60, 0x01, 0x61, 0x02, 0x12, 0x00,
+                                                          0x12, 0x06]))
+        self.engine.step()
+        self.chip_emulator.memory_pointer = 0x206
+        self.engine.step()
+
+        self.chip_emulator.memory.write_byte(0x206, 0x12)
+        self.assertEqual([0x200], sorted(self.engine.blocks))
+        self.chip_emulator.memory.write_byte(0x205, 0x00)
+        self.assertEqual([], sorted(self.engine.blocks))
+
+    def test_step__block_at_end_of_memory__same_as_interpreter(self):
+        program = bytes([0x60, 0x01, 0x61, 0x02, 0x62, 0x03])
+        reference = emulator.Emulator()
+        for chip_emulator in [reference, self.chip_emulator]:
+            chip_emulator.memory.load_data(0xFFA, program)
+            chip_emulator.memory_pointer = 0xFFA
+        for _ in range(3):
+            reference.make_tact()
+
+        self.assertEqual(3, self.engine.step())
+        self.assert_same_state(reference, self.chip_emulator)
+        with self.assertRaises(IndexError):
+            reference.make_tact()
+        with self.assertRaises(IndexError):
+            self.engine.step()
+
+    def test_step__unknown_opcode__exception(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0x60, 0x01, 0x50, 0x01]))
+        with self.assertRaises(emulator.ImpossibleOperationException):
+            self.engine.step()
+
+
+if __name__ == '__main__':
+    unittest.main()
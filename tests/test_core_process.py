@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import core_process
+import emulator
+
+
+class CoreProcessTest(unittest.TestCase):
+    def setUp(self):
+        # 200: LD V0, K; LD F, V0; DRW V1, V1, 5; JP 200
+        self.rom = bytes([0xF0, 0x0A, 0xF0, 0x29, 0xD1, 0x15, 0x12, 0x00])
+        self.core = core_process.CoreProcess()
+        self.addCleanup(self.core.close)
+        self.core.load_rom(self.rom)
+        self.core.pause(False)
+
+    def expected_frame(self, key):
+        chip_emulator = emulator.Emulator()
+        chip_emulator.load_rom(self.rom)
+        chip_emulator.press_button(key)
+        chip_emulator.run_cycles(3)
+        return chip_emulator.screen.to_bytes()
+
+    def test_press_button__frame_published_to_shared_memory(self):
+        self.assertEqual(bytes(64 * 32), self.core.screen.front)
+
+        self.core.press_button(0x1)
+        self.assertTrue(self.core.wait_frame(timeout=5))
+        self.assertEqual(self.expected_frame(0x1), self.core.screen.front)
+        self.assertEqual([(0, 0, 64, 32)], self.core.screen.take_dirty_regions())
+        self.assertEqual([], self.core.screen.take_dirty_regions())
+
+    def test_save_state__load_state__restore_frame(self):
+        self.core.press_button(0x7)
+        self.core.wait_frame(timeout=5)
+        state = self.core.save_state()
+        self.core.reset()
+        self.assertEqual(bytes(64 * 32), self.core.screen.front)
+
+        self.core.load_state(state)
+        self.assertEqual(self.expected_frame(0x7), self.core.screen.front)
+
+    def test_press_release__tap_between_frames__seen_by_fx0a(self):
+        self.core.press_button(0x3)
+        self.core.release_button(0x3)
+        self.assertTrue(self.core.wait_frame(timeout=5))
+        self.assertEqual(self.expected_frame(0x3), self.core.screen.front)
+
+    def test_press_release__events_overwritten__no_key_left_held(self):
+        self.core.press_button(0x9)
+        self.assertTrue(self.core.wait_frame(timeout=5))
+        # events are not read while the core is paused
+        self.core.pause()
+        self.core.release_button(0x9)
+        for _ in range(core_process._events_size):
+            self.core.press_button(0x5)
+            self.core.release_button(0x5)
+        self.core.press_button(0x2)
+        frames = self.core.screen.frames_published
+        self.core.pause(False)
+        deadline = time.perf_counter() + 5
+        while self.core.screen.frames_published == frames and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+        chip_emulator = emulator.Emulator()
+        chip_emulator.load_state(self.core.save_state())
+        self.assertEqual(1 << 0x2, chip_emulator.keypad.state)
+
+    def test_run__broken_rom__core_paused_and_error_reported(self):
+        self.core.load_rom(b"\xff\xff")
+        deadline = time.perf_counter() + 5
+        error = None
+        while error is None and time.perf_counter() < deadline:
+            error = self.core.take_error()
+            time.sleep(0.01)
+        self.assertIn("ImpossibleOperationException", error)
+        self.assertIsNone(self.core.take_error())
+
+        self.core.load_rom(self.rom)
+        self.core.pause(False)
+        self.core.press_button(0x2)
+        self.assertTrue(self.core.wait_frame(timeout=5))
+        self.assertEqual(self.expected_frame(0x2), self.core.screen.front)
+
+    def test_call__process_died__exception(self):
+        self.core._process.terminate()
+        self.core._process.join(5)
+        with self.assertRaises(core_process.CoreProcessException):
+            self.core.reset()
+
+    def test_load_state__incorrect_state__exception(self):
+        with self.assertRaises(core_process.CoreProcessException):
+            self.core.load_state(b"XXXX")
+
+
+if __name__ == '__main__':
+    unittest.main()
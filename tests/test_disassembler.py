@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import disassembler
+import settings
+
+
+class DisassemblerTest(unittest.TestCase):
+    def setUp(self):
+        self.rom = bytes([
+            0xA2, 0x10,  # 200: LD I, 210
+            0x22, 0x0C,  # 202: CALL 20C
+            0xF0, 0x07,  # 204: LD V0, DT
+            0x30, 0x00,  # 206: SE V0, 00
+            0x12, 0x04,  # 208: JP 204
+            0x12, 0x00,  # 20A: JP 200
+            0xD0, 0x15,  # 20C: DRW V0, V1, 5
+            0x00, 0xEE,  # 20E: RET
+            0xF0, 0x90,  # 210: sprite
+            0xF0,
+        ])
+
+    def test_format_instruction(self):
+        self.assertEqual("DRW VA, VB, 6", disassembler.format_instruction(0xDAB6))
+        self.assertEqual("LD V3, [I]", disassembler.format_instruction(0xF365))
+        self.assertEqual("DW FFFF", disassembler.format_instruction(0xFFFF))
+
+    def test_analyze__blocks_calls_and_loops(self):
+        analysis = disassembler.analyze(self.rom)
+
+        self.assertEqual([0x200, 0x204, 0x208, 0x20A, 0x20C], sorted(analysis.blocks))
+        self.assertEqual([0x204], analysis.blocks[0x200].successors)
+        self.assertEqual([0x20C], analysis.blocks[0x200].calls)
+        self.assertEqual([0x208, 0x20A], analysis.blocks[0x204].successors)
+        self.assertEqual({0x200, 0x204}, analysis.loop_headers)
+        self.assertEqual({(0x200, 0x20C)}, analysis.calls)
+        self.assertEqual([0x20C], analysis.functions[0x20C])
+
+    def test_analyze__code_and_data_separated(self):
+        analysis = disassembler.analyze(self.rom)
+
+        self.assertEqual([[0x210, 0x213]], analysis.data_ranges())
+        self.assertEqual({0x210}, analysis.data_references)
+        self.assertIn("210:  F0 90 F0", analysis.to_text())
+
+    def test_analyze__same_rom__cached(self):
+        self.assertIs(disassembler.analyze(self.rom), disassembler.analyze(bytearray(self.rom)))
+
+    def test_analyze__bundled_roms__whole_code_is_decoded(self):
+        for name in ["PONG", "BRIX", "TETRIS"]:
+            with open(settings.games_folder + name, 'rb') as f:
+                analysis = disassembler.analyze(f.read())
+            result = json.loads(json.dumps(analysis.to_json()))
+            self.assertEqual([], result["invalid"])
+            self.assertGreater(len(result["blocks"]), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -581,6 +581,176 @@ class EmulatorTest(unittest.TestCase):
         self.chip_emulator._op_0xf_29(x)
         self.assertEqual(expected, self.chip_emulator.register_i)
 
+    def test_decode_table__same_as_parse_word(self):
+        words = [0x00e0, 0x00ee, 0x1234, 0x8ab4, 0xd123, 0xf533, 0xc493, 0xe19e]
+        for word in words:
+            opcode, args = emulator.Emulator.parse_word(word)
+            handler, table_args, is_draw, _ = self.chip_emulator._decode_table[word]
+            self.assertEqual(self.chip_emulator.instructions[opcode].__func__, handler)
+            self.assertEqual(tuple(args), table_args)
+            self.assertEqual(opcode == 0xD, is_draw)
+
+    def test_make_tact__execute_instruction_and_increase_memory_pointer(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0x6a, 0x12]))
+        self.chip_emulator.make_tact()
+        self.assertEqual(0x12, self.chip_emulator.registers[0xa])
+        self.assertEqual(0x202, self.chip_emulator.memory_pointer)
+
+    def test_make_tact__jump__do_not_increase_memory_pointer(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0x13, 0x45]))
+        self.chip_emulator.make_tact()
+        self.assertEqual(0x345, self.chip_emulator.memory_pointer)
+
+    def test_make_tact__unknown_opcode__exception(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0x50, 0x01]))
+        with self.assertRaises(emulator.ImpossibleOperationException):
+            self.chip_emulator.make_tact()
+
+    def test_op_0xd__packed_screen__same_as_screen(self):
+        packed_emulator = emulator.Emulator(packed_screen=True)
+        for chip_emulator in [self.chip_emulator, packed_emulator]:
+            chip_emulator.register_i = 0x0
+            chip_emulator.registers[1] = 60
+            chip_emulator.registers[2] = 30
+            chip_emulator._op_0xd(1, 2, 5)
+            chip_emulator._op_0xd(0, 0, 5)
+            chip_emulator._op_0xd(0, 0, 1)
+
+        self.assertEqual(self.chip_emulator.screen.to_bytes(),
+                         packed_emulator.screen.to_bytes())
+        self.assertEqual(1, packed_emulator.registers[0xF])
+
+    def test_run_cycles__decrease_timers_by_emulated_time(self):
+        chip_emulator = emulator.Emulator(cycles_per_timer_tick=10)
+        chip_emulator.memory.load_data(0x200, bytes([0x12, 0x00]))
+        chip_emulator.delay_timer = 5
+        chip_emulator.sound_timer = 1
+
+        chip_emulator.run_cycles(9)
+        self.assertEqual(5, chip_emulator.delay_timer)
+        chip_emulator.run_cycles(16)
+        self.assertEqual(3, chip_emulator.delay_timer)
+        self.assertEqual(0, chip_emulator.sound_timer)
+        self.assertEqual(25, chip_emulator.cycles)
+
+        chip_emulator.run_cycles(100)
+        self.assertEqual(0, chip_emulator.delay_timer)
+
+    def test_load_state__continue_from_saved_state(self):
+        self.chip_emulator.load_file_in_memory(settings.games_folder + "BRIX")
+        self.chip_emulator.run_cycles(500)
+        self.chip_emulator.stack.append(0x234)
+        state = self.chip_emulator.save_state()
+        self.chip_emulator.stack.pop()
+        self.chip_emulator.run_cycles(500)
+        expected = self.chip_emulator.save_state()
+
+        restored_emulator = emulator.Emulator()
+        restored_emulator.load_state(state)
+        self.assertEqual(state, restored_emulator.save_state())
+        self.assertEqual([0x234], restored_emulator.stack)
+        restored_emulator.stack.pop()
+        restored_emulator.run_cycles(500)
+        self.assertEqual(expected, restored_emulator.save_state())
+
+    def test_load_state__packed_screen__same_state(self):
+        self.chip_emulator.load_file_in_memory(settings.games_folder + "MAZE")
+        self.chip_emulator.run_cycles(300)
+        state = self.chip_emulator.save_state()
+
+        packed_emulator = emulator.Emulator(packed_screen=True)
+        packed_emulator.load_state(state)
+        self.assertEqual(state, packed_emulator.save_state())
+
+    def test_load_state__random_generator_restored(self):
+        # 200: RND V0, FF; LD V1, V0; JP 200
+        self.chip_emulator.load_rom(bytes([0xC0, 0xFF, 0x81, 0x00, 0x12, 0x00]))
+        self.chip_emulator.run_cycles(30)
+        state = self.chip_emulator.save_state()
+        self.chip_emulator.run_cycles(300)
+        expected = self.chip_emulator.save_state()
+
+        restored_emulator = emulator.Emulator()
+        restored_emulator.load_state(state)
+        restored_emulator.run_cycles(300)
+        self.assertEqual(expected, restored_emulator.save_state())
+
+    def test_save_state__too_deep_stack__exception(self):
+        self.chip_emulator.stack = [0x200] * 256
+        with self.assertRaises(emulator.ImpossibleOperationException):
+            self.chip_emulator.save_state()
+
+    def test_load_state__incorrect_state__exception(self):
+        state = self.chip_emulator.save_state()
+        for incorrect_state in [b"", b"XXXX" + state[4:], state[:-1]]:
+            with self.assertRaises(emulator.IncorrectStateException):
+                self.chip_emulator.load_state(incorrect_state)
+
+    def test_restart__same_state_as_after_load(self):
+        self.chip_emulator.load_file_in_memory(settings.games_folder + "BRIX")
+        expected = self.chip_emulator.save_state()
+        self.chip_emulator.run_cycles(1000)
+
+        self.chip_emulator.restart()
+        self.assertEqual(expected, self.chip_emulator.save_state())
+
+    def test_make_rom_image__same_as_loaded_memory(self):
+        with open(settings.games_folder + "PONG", 'rb') as f:
+            data = f.read()
+        self.chip_emulator.load_rom(data)
+
+        self.assertEqual(self.chip_emulator.memory.to_bytes(),
+                         bytes(self.chip_emulator.make_rom_image(data)))
+
+    def test_run_cycles__idle_loop__same_state_as_without_skipping(self):
+        states = []
+        for skip_idle_loops in [False, True]:
+            chip_emulator = emulator.Emulator(cycles_per_timer_tick=97)
+            chip_emulator.skip_idle_loops = skip_idle_loops
+            chip_emulator.load_file_in_memory(settings.games_folder + "PONG")
+            chip_emulator.seed(0)
+            for count in [50, 97, 200, 31] * 20:
+                chip_emulator.run_cycles(count)
+            states.append(chip_emulator.save_state())
+        self.assertEqual(states[0], states[1])
+
+    def test_run_cycles__idle_loop__instructions_are_not_executed(self):
+        # 200: LD V0, 05; LD DT, V0; LD V1, DT; SE V1, 00; JP 204
+        self.chip_emulator.load_rom(bytes([0x60, 0x05, 0xF0, 0x15, 0xF1, 0x07,
+                                           0x31, 0x00, 0x12, 0x04]))
+        self.chip_emulator.cycles_per_timer_tick = 1000
+        self.chip_emulator.restart()
+        executed = []
+        self.chip_emulator.make_tact = lambda: (
+            executed.append(self.chip_emulator.memory_pointer),
+            emulator.Emulator.make_tact(self.chip_emulator))
+
+        self.chip_emulator.run_cycles(1000)
+        self.assertEqual([0x200, 0x202, 0x204], executed)
+        # 997 instructions of the loop are skipped
+        self.assertEqual(0x208, self.chip_emulator.memory_pointer)
+        self.assertEqual(5, self.chip_emulator.registers[1])
+        self.assertEqual(4, self.chip_emulator.delay_timer)
+
+    def test_run_cycles__waiting_for_key__only_timers_change(self):
+        # 200: LD V1, K; JP 200
+        self.chip_emulator.load_rom(bytes([0xF1, 0x0A, 0x12, 0x00]))
+        self.chip_emulator.delay_timer = 50
+        executed = []
+        self.chip_emulator.make_tact = lambda: (
+            executed.append(self.chip_emulator.memory_pointer),
+            emulator.Emulator.make_tact(self.chip_emulator))
+
+        self.chip_emulator.run_cycles(self.chip_emulator.cycles_per_timer_tick * 20)
+        self.assertEqual([0x200], executed)
+        self.assertEqual(30, self.chip_emulator.delay_timer)
+        self.assertTrue(self.chip_emulator.is_waiting_for_key)
+
+        self.chip_emulator.press_button(7)
+        self.chip_emulator.run_cycles(1)
+        self.assertEqual(7, self.chip_emulator.registers[1])
+        self.assertFalse(self.chip_emulator.is_waiting_mode)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import fleet
+import headless
+
+
+class FleetTest(unittest.TestCase):
+    def test_run_jobs__same_result_as_headless(self):
+        jobs = [fleet.Job("MAZE", 500), fleet.Job("BRIX", 700, "5:+4,20:-4"),
+                fleet.Job("BRIX", 700, "5:+4,20:-4")]
+        results = sorted(fleet.run_jobs(jobs, processes=2),
+                         key=lambda result: result["job"])
+
+        self.assertEqual([0, 1, 2], [result["job"] for result in results])
+        expected = headless.run_rom(headless.resolve_rom("BRIX"), cycles=700,
+                                    key_events=headless.parse_key_script("5:+4,20:-4"))
+        for result in results[1:]:
+            self.assertEqual(700, result["instructions"])
+            self.assertEqual(expected["screen_hash"], result["screen_hash"])
+
+    def test_run_jobs__broken_rom__error_result(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "BROKEN")
+            with open(path, "wb") as f:
+                f.write(b"\xff\xff")
+            jobs = [fleet.Job(path, 100, engine="blocks"), fleet.Job("MAZE", 100, engine="blocks")]
+            results = sorted(fleet.run_jobs(jobs, processes=1),
+                             key=lambda result: result["job"])
+
+        self.assertIn("ImpossibleOperationException", results[0]["error"])
+        self.assertGreaterEqual(results[1]["instructions"], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
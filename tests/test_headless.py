@@ -0,0 +1,93 @@
+import contextlib
+import io
+import tempfile
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import headless
+import settings
+
+
+class HeadlessTest(unittest.TestCase):
+    def test_parse_key_script(self):
+        expected = [(10, 0x4, True), (20, 0xa, True), (30, 0x4, False)]
+        self.assertEqual(expected, headless.parse_key_script("30:-4, 10:+4,20:+a"))
+
+    def test_parse_key_script__incorrect_event__exception(self):
+        for script in ["10:*4", "10:+g", "ab:+1", "10"]:
+            with self.assertRaises(headless.IncorrectKeyScriptException):
+                headless.parse_key_script(script)
+
+    def test_run_rom__count_instructions_and_frames(self):
+        result = headless.run_rom(settings.games_folder + "MAZE",
+                                  cycles=1005, instructions_per_frame=10)
+        self.assertEqual(1005, result["instructions"])
+        self.assertEqual(101, result["frames"])
+
+    def test_main__not_positive_ipf__error(self):
+        for value in ["0", "-5"]:
+            with self.assertRaises(SystemExit), \
+                    contextlib.redirect_stderr(io.StringIO()):
+                headless.main(["--ipf", value, "-f", "10", "MAZE"])
+        with self.assertRaises(ValueError):
+            headless.run_rom(settings.games_folder + "MAZE", frames=10, instructions_per_frame=0)
+
+    def test_main__profile_with_blocks__error(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            headless.main(["--engine", "blocks", "--profile", "-f", "10", "MAZE"])
+        with self.assertRaises(ValueError):
+            headless.run_rom(settings.games_folder + "MAZE", frames=10,
+                             engine="blocks", profile=True)
+
+    def test_run_rom__engines_give_same_screen(self):
+        results = []
+        for engine in ["interpreter", "blocks"]:
+            results.append(headless.run_rom(settings.games_folder + "MAZE",
+                                            frames=100, engine=engine, seed=0))
+        self.assertEqual(results[0]["screen_hash"], results[1]["screen_hash"])
+
+    def test_run_rom__engines_give_same_frames(self):
+        for game in ["BRIX", "TANK"]:
+            results = []
+            for engine in ["interpreter", "blocks"]:
+                results.append(headless.run_rom(settings.games_folder + game, cycles=20000,
+                                                key_events=headless.parse_key_script("30:+4,90:-4"),
+                                                engine=engine, seed=0))
+            self.assertEqual(2000, results[0]["frames"])
+            self.assertEqual(results[0]["frames"], results[1]["frames"])
+
+    def test_run_rom__waiting_for_key_without_events__stop(self):
+        result = headless.run_rom(settings.games_folder + "TICTAC", frames=10000)
+        self.assertTrue(result["waiting_for_input"])
+        self.assertLess(result["frames"], 100)
+
+    def test_run_rom__waiting_for_key__jump_to_next_event(self):
+        results = []
+        for is_waiting in [False, True]:
+            key_events = headless.parse_key_script("2000:+1,2010:-1")
+            if not is_waiting:
+                # release of not pressed key keeps runner frame by frame
+                key_events = [(frame, 0xf, False) for frame in range(2000)] + key_events
+            results.append(headless.run_rom(settings.games_folder + "TICTAC", frames=2100,
+                                             key_events=key_events))
+        self.assertEqual(results[0]["screen_hash"], results[1]["screen_hash"])
+        self.assertGreater(results[1]["frames"], 2010)
+
+    def test_run_rom__error__block_engine_detached(self):
+        chip_emulator = emulator.Emulator()
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "BROKEN")
+            with open(path, "wb") as f:
+                f.write(b"\xff\xff")
+            with self.assertRaises(emulator.ImpossibleOperationException):
+                headless.run_rom(path, cycles=10, engine="blocks", chip_emulator=chip_emulator)
+        self.assertEqual([], chip_emulator.memory.write_listeners)
+
+
+if __name__ == '__main__':
+    unittest.main()
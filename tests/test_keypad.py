@@ -0,0 +1,138 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import keypad
+import scheduler
+
+
+class KeypadTest(unittest.TestCase):
+    def setUp(self):
+        self.keypad = keypad.Keypad()
+
+    def test_drain__simultaneous_keys__all_pressed(self):
+        self.keypad.push(0x4, True)
+        self.keypad.push(0x6, True)
+        self.keypad.push(0x4, False)
+        self.assertEqual(0, self.keypad.state)
+
+        applied = self.keypad.drain()
+        self.assertEqual([(0x4, True), (0x6, True), (0x4, False)], applied)
+        self.assertTrue(self.keypad.is_pressed(0x6))
+        self.assertFalse(self.keypad.has_events())
+
+    def test_drain__tap_in_one_frame__seen_once(self):
+        self.keypad.push(0x4, True)
+        self.keypad.push(0x4, False)
+        self.keypad.drain()
+        self.assertEqual(0, self.keypad.state)
+
+        self.assertTrue(self.keypad.is_pressed(0x4))
+        self.assertFalse(self.keypad.is_pressed(0x4))
+
+    def test_take_pressed__tap_before_wait__key_taken(self):
+        self.keypad.press(0x9)
+        self.keypad.release(0x9)
+        self.assertEqual(0x9, self.keypad.take_pressed())
+        self.assertFalse(self.keypad.is_pressed(0x9))
+
+    def test_release__observed_key__not_latched(self):
+        self.keypad.press(0x2)
+        self.assertTrue(self.keypad.is_pressed(0x2))
+        self.keypad.release(0x2)
+        self.assertFalse(self.keypad.is_pressed(0x2))
+        self.assertIsNone(self.keypad.take_pressed())
+
+    def test_take_pressed__consume_last_pressed_key(self):
+        self.keypad.press(0x1)
+        self.keypad.press(0x2)
+
+        self.assertEqual(0x2, self.keypad.take_pressed())
+        self.assertIsNone(self.keypad.take_pressed())
+        self.assertTrue(self.keypad.is_pressed(0x2))
+
+    def test_push__more_than_max_events__new_presses_dropped(self):
+        small_keypad = keypad.Keypad(max_events=2)
+        for key in range(3):
+            small_keypad.push(key, True)
+        self.assertEqual([(0, True), (1, True)], small_keypad.drain())
+        self.assertEqual(1, small_keypad.dropped_presses)
+
+    def test_push__flood__no_key_left_held(self):
+        small_keypad = keypad.Keypad(max_events=4)
+        for _ in range(100):
+            for key in range(small_keypad.keys_count):
+                small_keypad.push(key, True)
+                small_keypad.push(key, False)
+        small_keypad.drain()
+        self.assertEqual(0, small_keypad.state)
+        self.assertGreater(small_keypad.dropped_presses, 0)
+
+    def test_latency_report__first_read_and_next_draw(self):
+        self.keypad.push(0x5, True)
+        self.keypad.drain()
+        self.assertEqual({"read_samples": 0, "draw_samples": 0}, self.keypad.latency_report())
+
+        self.keypad.is_pressed(0x5)
+        self.keypad.is_pressed(0x5)
+        self.keypad.mark_drawn()
+        self.keypad.mark_drawn()
+
+        report = self.keypad.latency_report()
+        self.assertEqual(1, report["read_samples"])
+        self.assertEqual(1, report["draw_samples"])
+        self.assertGreaterEqual(report["p99_draw_latency"], report["p50_read_latency"])
+
+
+class EmulatorKeypadTest(unittest.TestCase):
+    def setUp(self):
+        self.chip_emulator = emulator.Emulator(cycles_per_timer_tick=4)
+
+    def test_op_0xe_9e__two_keys_held__both_seen(self):
+        self.chip_emulator.press_button(0x4)
+        self.chip_emulator.press_button(0x6)
+        for key in [0x4, 0x6]:
+            self.chip_emulator.memory_pointer = 0x200
+            self.chip_emulator.registers[0] = key
+            self.chip_emulator._op_0xe_9e(0)
+            self.assertEqual(0x202, self.chip_emulator.memory_pointer)
+
+    def test_run_frame__key_from_queue__latencies_measured(self):
+        # 200: LD V0, 7; SKNP V0; DRW V0, V0, 1; JP 200
+        self.chip_emulator.load_rom(bytes([0x60, 0x07, 0xE0, 0xA1, 0xD0, 0x01, 0x12, 0x00]))
+        frame_scheduler = scheduler.FrameScheduler(self.chip_emulator, instructions_per_frame=4)
+        self.assertFalse(frame_scheduler.run_frame())
+
+        self.chip_emulator.keypad.push(0x7, True)
+        self.chip_emulator.keypad.drain()
+        self.assertTrue(frame_scheduler.run_frame())
+
+        report = self.chip_emulator.keypad.latency_report()
+        self.assertEqual(1, report["read_samples"])
+        self.assertEqual(1, report["draw_samples"])
+
+    def test_pressed_button__setter__queue_kept(self):
+        self.chip_emulator.keypad.push(0x1, True)
+        self.chip_emulator.pressed_button = 0x5
+        self.chip_emulator.pressed_button = None
+
+        self.assertTrue(self.chip_emulator.keypad.has_events())
+        self.assertFalse(self.chip_emulator.keypad.is_pressed(0x5))
+
+    def test_load_state__keypad_restored(self):
+        self.chip_emulator.press_button(0x3)
+        self.chip_emulator.press_button(0xc)
+        state = self.chip_emulator.save_state()
+
+        restored_emulator = emulator.Emulator()
+        restored_emulator.load_state(state)
+        self.assertEqual((1 << 0x3) | (1 << 0xc), restored_emulator.keypad.state)
+        self.assertEqual(0xc, restored_emulator.pressed_button)
+
+
+if __name__ == '__main__':
+    unittest.main()
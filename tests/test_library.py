@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import hashlib
+import shutil
+import tempfile
+import zipfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import library
+import settings
+
+
+class ParseDescriptionsTest(unittest.TestCase):
+    def test_parse_descriptions__description_and_controls(self):
+        text = ("# Игры\n"
+                "## PONG 2\n"
+                "Игра для двоих.\n"
+                "Отбивайте шарик.\n\n"
+                "Управление:\n"
+                "* `1` - вверх\n"
+                "* `Q` - вниз\n\n"
+                "## MAZE\n"
+                "Лабиринт.\n\n"
+                "Управление: отсутствует\n")
+        descriptions = library.parse_descriptions(text)
+
+        self.assertEqual(("Игра для двоих. Отбивайте шарик.", ["`1` - вверх", "`Q` - вниз"]),
+                         descriptions["PONG2"])
+        self.assertEqual(("Лабиринт.", []), descriptions["MAZE"])
+
+
+class RomLibraryTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.games_folder = os.path.join(self.folder, "games")
+        os.mkdir(self.games_folder)
+        for name in ["PONG", "MAZE", "_test_file"]:
+            shutil.copy(settings.games_folder + name, self.games_folder)
+
+        self.archive_file = os.path.join(self.folder, "roms.zip")
+        with zipfile.ZipFile(self.archive_file, 'w') as archive:
+            archive.write(settings.games_folder + "PONG", "games/PONG")
+            archive.write(settings.games_folder + "BRIX", "games/BRIX")
+            archive.write(settings.games_folder + "MAZE", "other/MAZE")
+
+        self.description_file = os.path.join(self.folder, "GAMES.md")
+        with open(self.description_file, 'w', encoding='utf-8') as f:
+            f.write("## BRIX\nРазбейте блоки.\n\nУправление:\n* `Q` - налево\n")
+
+        self.index_file = os.path.join(self.folder, "index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_library(self):
+        rom_library = library.RomLibrary(self.games_folder, self.archive_file,
+                                         self.description_file, self.index_file)
+        self.addCleanup(rom_library.close)
+        return rom_library
+
+    def test_load__roms_from_folder_and_archive(self):
+        rom_library = self.create_library()
+        self.assertTrue(rom_library.load())
+
+        self.assertEqual(["games/MAZE", "games/PONG", "roms.zip/games/BRIX", "roms.zip/games/PONG"],
+                         [entry.id for entry in rom_library.entries])
+        brix = rom_library.resolve("BRIX")
+        self.assertEqual("Разбейте блоки.", brix.description)
+        self.assertEqual(["`Q` - налево"], brix.controls)
+        with open(settings.games_folder + "BRIX", 'rb') as f:
+            self.assertEqual(f.read(), rom_library.read(brix))
+
+    def test_load__index_is_up_to_date__do_not_scan(self):
+        self.create_library().load()
+
+        rom_library = self.create_library()
+        self.assertFalse(rom_library.load())
+        self.assertEqual(4, len(rom_library.entries))
+
+    def test_load__rom_added__scan_again(self):
+        self.create_library().load()
+        shutil.copy(settings.games_folder + "TANK", self.games_folder)
+
+        rom_library = self.create_library()
+        self.assertTrue(rom_library.load())
+        self.assertEqual("games/TANK", rom_library.resolve("TANK").id)
+
+    def test_resolve__by_name_id_and_hash(self):
+        rom_library = self.create_library()
+        rom_library.load()
+        with open(settings.games_folder + "PONG", 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+
+        # games folder wins over archive
+        self.assertEqual("games/PONG", rom_library.resolve("pong").id)
+        self.assertEqual("games/PONG", rom_library.resolve(digest).id)
+        self.assertEqual("roms.zip/games/PONG", rom_library.resolve("roms.zip/games/PONG").id)
+        self.assertEqual(os.path.join(self.games_folder, "PONG"), rom_library.locate("PONG"))
+        with self.assertRaises(FileNotFoundError):
+            rom_library.resolve("_test_file")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -67,6 +67,36 @@ class MemoryTest(unittest.TestCase):
         for i in range(0x200, 4096, 1):
             self.assertEqual(0, self.memory.read_byte(i))
 
+    def test_load_image__replace_all_memory(self):
+        image = bytes(i % 256 for i in range(4096))
+        self.memory.load_image(image)
+        self.assertEqual(image, self.memory._memory)
+
+    def test_load_image__incorrect_size__exception(self):
+        with self.assertRaises(memory.MemoryOverflowException):
+            self.memory.load_image(bytes(4097))
+
+    def test_view__existing_part_of_memory__view_without_copy(self):
+        self.memory.load_data(0x300, bytes([1, 2, 3]))
+        view = self.memory.view(0x300, 3)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes([1, 2, 3]), view)
+
+        self.memory.write_byte(0x301, 7)
+        self.assertEqual(7, view[1])
+
+    def test_view__if_end_address_more_than_memory_size__exception(self):
+        self.try_catch_exception_when_execute_operation(
+            self.memory.view,
+            memory.IncorrectAddressException,
+            4090, 6
+        )
+
+    def test_load_data__overflow__exception_without_writing(self):
+        with self.assertRaises(memory.MemoryOverflowException):
+            self.memory.load_data(4094, bytes([1, 2, 3]))
+        self.assertEqual(0, self.memory.read_byte(4094))
+
 
 if __name__ == '__main__':
     unittest.main()
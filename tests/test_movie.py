@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import headless
+import movie
+import settings
+
+
+class MovieTest(unittest.TestCase):
+    def setUp(self):
+        self.rom_file = settings.games_folder + "BLINKY"
+        with open(self.rom_file, 'rb') as f:
+            self.rom_data = f.read()
+        self.key_events = headless.parse_key_script("100:+6,130:-6,140:+7,180:-7")
+
+    def test_replay__same_frames_as_record(self):
+        recorded_movie = movie.record(self.rom_file, 300, self.key_events, seed=7)
+
+        first_frames, is_same = movie.replay(recorded_movie, self.rom_data)
+        self.assertTrue(is_same)
+        second_frames, _ = movie.replay(recorded_movie, self.rom_data)
+        self.assertEqual(300, len(first_frames))
+        self.assertEqual(first_frames, second_frames)
+
+    def test_from_bytes__same_movie(self):
+        recorded_movie = movie.record(self.rom_file, 200, self.key_events, seed=3)
+        loaded_movie = movie.Movie.from_bytes(recorded_movie.to_bytes())
+
+        self.assertEqual(recorded_movie.events, loaded_movie.events)
+        self.assertEqual("BLINKY", loaded_movie.rom_name)
+        self.assertEqual(3, loaded_movie.seed)
+        self.assertTrue(movie.replay(loaded_movie, self.rom_data)[1])
+
+    def test_from_bytes__damaged_movie__exception(self):
+        data = movie.record(self.rom_file, 10, seed=1).to_bytes()
+        for damaged in [b"", b"XXXX" + data[4:], data[:-1]]:
+            with self.assertRaises(movie.IncorrectMovieException):
+                movie.Movie.from_bytes(damaged)
+
+    def test_replay__another_rom__exception(self):
+        recorded_movie = movie.record(self.rom_file, 10, seed=1)
+        with self.assertRaises(movie.IncorrectMovieException):
+            movie.replay(recorded_movie, b"\x12\x00")
+
+
+if __name__ == '__main__':
+    unittest.main()
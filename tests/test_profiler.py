@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.chip_emulator = emulator.Emulator()
+        # V0 += 1; draw; jump to start
+        self.chip_emulator.memory.load_data(0x200, bytes([0x70, 0x01, 0xd0, 0x01, 0x12, 0x00]))
+        self.profiler = profiler.Profiler(self.chip_emulator)
+
+    def test_report__count_handlers_and_addresses(self):
+        with self.profiler:
+            self.chip_emulator.run_cycles(30)
+
+        report = self.profiler.report()
+        counts = {item["handler"]: item["count"] for item in report["handlers"]}
+        self.assertEqual({"_op_0x7": 10, "_op_0xd": 10, "_op_0x1": 10}, counts)
+        self.assertEqual(30, report["instructions"])
+        self.assertEqual({0x200, 0x202, 0x204},
+                         {item["address"] for item in report["addresses"]})
+        self.assertEqual(10, self.chip_emulator.registers[0])
+
+    def test_disable__restore_make_tact(self):
+        self.profiler.enable()
+        self.profiler.disable()
+        self.assertNotIn("make_tact", vars(self.chip_emulator))
+
+        self.chip_emulator.run_cycles(3)
+        self.assertEqual(0, self.profiler.report()["instructions"])
+
+    def test_to_text__contain_handlers(self):
+        with self.profiler:
+            self.chip_emulator.run_cycles(3)
+        self.assertIn("_op_0xd", self.profiler.to_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
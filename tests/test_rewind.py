@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import rewind
+import settings
+
+
+class RewindBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.chip_emulator = emulator.Emulator()
+        self.chip_emulator.load_file_in_memory(settings.games_folder + "BRIX")
+        self.buffer = rewind.RewindBuffer(keyframe_interval=8)
+
+    def record_frames(self, count):
+        states = []
+        for _ in range(count):
+            self.chip_emulator.run_cycles(10)
+            self.buffer.record(self.chip_emulator)
+            states.append(self.chip_emulator.save_state())
+        return states
+
+    def test_rewind__restore_frames_in_reverse_order(self):
+        states = self.record_frames(30)
+
+        for state in reversed(states):
+            self.assertTrue(self.buffer.rewind(self.chip_emulator))
+            self.assertEqual(state, self.chip_emulator.save_state())
+        self.assertFalse(self.buffer.rewind(self.chip_emulator))
+        self.assertEqual(0, self.buffer.size)
+
+    def test_record__after_rewind__continue_history(self):
+        states = self.record_frames(12)
+        for _ in range(6):
+            self.buffer.rewind(self.chip_emulator)
+        states = states[:6] + self.record_frames(5)
+
+        for state in reversed(states):
+            self.buffer.rewind(self.chip_emulator)
+            self.assertEqual(state, self.chip_emulator.save_state())
+
+    def test_record__more_than_max_size__drop_oldest_frames(self):
+        self.buffer.max_size = 4000
+        self.record_frames(200)
+
+        self.assertLessEqual(self.buffer.size, 4000)
+        self.assertLess(len(self.buffer), 200)
+        self.assertGreater(len(self.buffer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
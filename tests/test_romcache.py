@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import romcache
+import settings
+
+
+class RomCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = romcache.RomCache(max_size=2)
+        self.chip_emulator = emulator.Emulator()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def copy_rom(self, name, file_name=None):
+        path = os.path.join(self.folder, file_name or name)
+        shutil.copy(settings.games_folder + name, path)
+        return path
+
+    def test_load_cached_rom__same_state_as_load_file(self):
+        path = self.copy_rom("PONG")
+        expected_emulator = emulator.Emulator()
+        expected_emulator.load_file_in_memory(path)
+
+        self.chip_emulator.run_cycles(100)
+        self.chip_emulator.load_cached_rom(path, self.cache)
+        for chip_emulator in [expected_emulator, self.chip_emulator]:
+            chip_emulator.seed(0)
+        self.assertEqual(expected_emulator.save_state(), self.chip_emulator.save_state())
+
+    def test_load_cached_rom__file_removed__use_cache(self):
+        path = self.copy_rom("PONG")
+        self.chip_emulator.load_cached_rom(path, self.cache)
+        expected = self.chip_emulator.save_state()
+        os.remove(path)
+
+        self.chip_emulator.run_cycles(500)
+        self.chip_emulator.load_cached_rom(path, self.cache)
+        self.assertEqual(expected, self.chip_emulator.save_state())
+
+    def test_get_image__same_content__one_image(self):
+        first = self.copy_rom("PONG")
+        second = self.copy_rom("PONG", "PONG_COPY")
+
+        image = self.cache.get_image(first, self.chip_emulator.make_rom_image)
+        self.assertIs(image, self.cache.get_image(second, self.chip_emulator.make_rom_image))
+        self.assertEqual(1, len(self.cache))
+
+    def test_get_image__more_than_max_size__drop_least_recently_used(self):
+        paths = [self.copy_rom(name) for name in ["PONG", "BRIX", "MAZE"]]
+        for path in [paths[0], paths[1], paths[0], paths[2]]:
+            self.cache.get_image(path, self.chip_emulator.make_rom_image)
+
+        self.assertEqual(2, len(self.cache))
+        self.assertIn(paths[0], self.cache)
+        self.assertNotIn(paths[1], self.cache)
+        self.assertIn(paths[2], self.cache)
+
+    def test_get_image__not_existing_file__exception(self):
+        with self.assertRaises(BlockingIOError):
+            self.cache.get_image(os.path.join(self.folder, "NONE"),
+                                 self.chip_emulator.make_rom_image)
+
+
+if __name__ == '__main__':
+    unittest.main()
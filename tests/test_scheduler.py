@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import scheduler
+
+
+class FrameSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.chip_emulator = emulator.Emulator(cycles_per_timer_tick=4)
+        self.scheduler = scheduler.FrameScheduler(self.chip_emulator,
+                                                  instructions_per_frame=4)
+
+    def test_run_frame__execute_budget_and_tick_timers(self):
+        # V0 += 1 forever
+        self.chip_emulator.memory.load_data(0x200, bytes([0x70, 0x01, 0x12, 0x00]))
+        self.chip_emulator.delay_timer = 10
+
+        self.assertFalse(self.scheduler.run_frame())
+
+        self.assertEqual(2, self.chip_emulator.registers[0])
+        self.assertEqual(9, self.chip_emulator.delay_timer)
+        self.assertEqual(1, self.scheduler.frames)
+
+    def test_run_frame__draw__true(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0xd0, 0x05, 0x12, 0x00]))
+        self.assertTrue(self.scheduler.run_frame())
+        self.assertEqual(self.chip_emulator.screen.to_bytes(), self.chip_emulator.screen.front)
+
+    def test_wait_next_frame__keep_frame_rate(self):
+        self.chip_emulator.memory.load_data(0x200, bytes([0x12, 0x00]))
+        start_time = time.perf_counter()
+        self.scheduler.wait_next_frame()
+        for _ in range(6):
+            self.scheduler.run_frame()
+            self.scheduler.wait_next_frame()
+        elapsed = time.perf_counter() - start_time
+
+        self.assertGreaterEqual(elapsed, 6 / 60)
+        report = self.scheduler.jitter_report()
+        self.assertEqual(6, report["frames"])
+        self.assertGreaterEqual(report["max_jitter"], 0)
+
+    def test_wait_for_input__advance_timers_by_waited_time(self):
+        # LD V0, K
+        self.chip_emulator.memory.load_data(0x200, bytes([0xF0, 0x0A]))
+        self.chip_emulator.delay_timer = 100
+        self.scheduler.run_frame()
+        self.assertTrue(self.chip_emulator.is_waiting_for_key)
+
+        event = threading.Event()
+        threading.Timer(0.1, event.set).start()
+        self.assertTrue(self.scheduler.wait_for_input(event, timeout=5))
+
+        self.assertLessEqual(self.chip_emulator.delay_timer, 100 - 1 - 5)
+        self.assertEqual(0x200, self.chip_emulator.memory_pointer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -166,6 +166,118 @@ class ScreenTest(unittest.TestCase):
             for x in range(self.screen.width):
                 self.assertEqual(0, self.screen.get_value(x, y))
 
+    def test_to_packed_bytes(self):
+        self.screen.set_value(0, 0, 1)
+        self.screen.set_value(63, 31, 1)
+        packed = self.screen.to_packed_bytes()
+        self.assertEqual(256, len(packed))
+        self.assertEqual(0x80, packed[0])
+        self.assertEqual(0x01, packed[-1])
+
+    def test_take_dirty_regions__after_draw_sprite__sprite_rectangle(self):
+        self.screen.take_dirty_regions()
+        self.screen.draw_sprite(60, 30, bytearray([0xff, 0xff, 0xff]))
+        self.screen.draw_sprite(3, 4, bytearray([0x1]))
+
+        self.assertEqual([(60, 30, 4, 2), (3, 4, 8, 1)], self.screen.take_dirty_regions())
+        self.assertEqual([], self.screen.take_dirty_regions())
+
+    def test_take_dirty_regions__after_reset__full_screen(self):
+        self.screen.set_value(1, 2, 1)
+        self.screen.reset()
+        self.assertIn((0, 0, 64, 32), self.screen.take_dirty_regions())
+
+    def test_take_dirty_regions__too_many_regions__full_screen(self):
+        self.screen.take_dirty_regions()
+        for i in range(self.screen.max_dirty_regions + 1):
+            self.screen.set_value(i % 64, 0, 1)
+        self.assertEqual([(0, 0, 64, 32)], self.screen.take_dirty_regions())
+
+    def test_publish__front_changed_only_by_publish(self):
+        self.screen.draw_sprite(0, 0, bytearray([0x80]))
+        front = self.screen.front
+        self.assertEqual(0, front[0])
+
+        self.assertTrue(self.screen.publish())
+        self.assertEqual(0, front[0])
+        self.assertEqual(self.screen.to_bytes(), self.screen.front)
+        self.assertFalse(self.screen.publish())
+        self.assertEqual(1, self.screen.frames_published)
+
+    def test_publish__buffers_swapped_without_allocation(self):
+        first, second = self.screen.front, self.screen._back
+        self.screen.draw_sprite(0, 0, bytearray([0x80]))
+        self.screen.publish()
+        self.screen.draw_sprite(8, 20, bytearray([0xff, 0x81]))
+        self.screen.publish()
+
+        self.assertIs(first, self.screen.front)
+        self.assertIs(second, self.screen._back)
+        self.assertEqual(self.screen.to_bytes(), self.screen.front)
+
+    def test_publish_on_draw__every_draw_published(self):
+        self.screen.publish_on_draw = True
+        self.screen.draw_sprite(0, 0, bytearray([0x80]))
+        self.assertEqual(1, self.screen.front[0])
+        self.screen.reset()
+        self.assertEqual(bytes(self.screen.size), self.screen.front)
+        self.assertEqual(2, self.screen.frames_published)
+
+
+class PackedScreenTest(unittest.TestCase):
+    def setUp(self):
+        self.screen = screen.PackedScreen()
+        self.reference = screen.Screen()
+
+    def test_draw_sprite__same_as_screen(self):
+        sprites = [(0, 0, [0x81, 0x39, 0x55, 0x83]), (60, 3, [0xff, 0x0f]),
+                   (2, 30, [0xf0, 0x90, 0xf0, 0x11]), (70, 4, [0xff]),
+                   (3, 1, [0xaa, 0x55, 0xaa]), (57, 0, [0xff] * 15)]
+        for x, y, data in sprites:
+            expected = self.reference.draw_sprite(x, y, bytearray(data))
+            actual = self.screen.draw_sprite(x, y, bytearray(data))
+            self.assertEqual(expected, actual)
+            self.assertEqual(self.reference.to_bytes(), self.screen.to_bytes())
+            self.assertEqual(self.reference.to_packed_bytes(), self.screen.to_packed_bytes())
+
+    def test_set_value__get_value(self):
+        self.screen.set_value(5, 7, 1)
+        self.screen.set_value(63, 31, 1)
+        self.assertEqual(1, self.screen.get_value(5, 7))
+        self.assertEqual(1, self.screen.get_value(63, 31))
+        self.assertEqual(0, self.screen.get_value(6, 7))
+
+        self.screen.set_value(5, 7, 0)
+        self.assertEqual(0, self.screen.get_value(5, 7))
+
+    def test_set_value__if_incorrect_coordinates__exception(self):
+        with self.assertRaises(screen.InvalidCoordinatesException):
+            self.screen.set_value(64, 0, 1)
+
+    def test_load_bytes__same_as_to_bytes(self):
+        self.reference.draw_sprite(10, 10, bytearray([0xde, 0xad, 0xbe, 0xef]))
+        self.screen.load_bytes(self.reference.to_bytes())
+        self.assertEqual(self.reference.to_bytes(), self.screen.to_bytes())
+
+    def test_reset(self):
+        self.screen.draw_sprite(0, 0, bytearray([0xff]))
+        self.screen.reset()
+        self.assertEqual(bytes(self.screen.size), self.screen.to_bytes())
+
+    def test_take_dirty_regions__after_draw_sprite__sprite_rectangle(self):
+        self.screen.take_dirty_regions()
+        self.screen.draw_sprite(62, 1, bytearray([0xff]))
+        self.assertEqual([(62, 1, 2, 1)], self.screen.take_dirty_regions())
+
+    def test_publish__same_as_screen(self):
+        sprites = [(7, 9, [0x3c, 0x42]), (60, 30, [0xff, 0xff, 0xff]), (7, 10, [0x42])]
+        for x, y, data in sprites:
+            for chip_screen in [self.reference, self.screen]:
+                chip_screen.draw_sprite(x, y, bytearray(data))
+                chip_screen.publish()
+            self.assertEqual(self.reference.front, self.screen.front)
+            self.assertEqual(self.screen.to_bytes(), self.screen.front)
+
 
 if __name__ == '__main__':
     unittest.main()
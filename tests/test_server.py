@@ -0,0 +1,165 @@
+import asyncio
+import tempfile
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import headless
+import library
+import server
+
+
+class EncodingTest(unittest.TestCase):
+    def test_rle__roundtrip(self):
+        for data in (b'', b'\x00' * 256, b'\x01\x02\x02\x03', b'\x05' * 600 + b'\x06'):
+            self.assertEqual(data, server.rle_decode(server.rle_encode(data)))
+
+    def test_rle__long_runs_are_split(self):
+        self.assertEqual(b'\xff\x00\xff\x00\x02\x00', server.rle_encode(bytes(512)))
+
+    def test_rle_decode__damaged_data(self):
+        with self.assertRaises(server.IncorrectMessageException):
+            server.rle_decode(b'\x01')
+
+    def test_encode_frame__roundtrip(self):
+        previous = bytes(range(256))
+        current = bytes(range(255, -1, -1))
+        payload = server.encode_frame(previous, current)
+        self.assertEqual(current, server.decode_frame(previous, payload))
+
+    def test_encode_frame__same_frame_is_short(self):
+        frame = bytes(range(256))
+        self.assertEqual(4, len(server.encode_frame(frame, frame)))
+
+    def test_decode_frame__wrong_size(self):
+        with self.assertRaises(server.IncorrectMessageException):
+            server.decode_frame(bytes(256), server.rle_encode(bytes(10)))
+
+
+class SessionServerTest(unittest.TestCase):
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(asyncio.wait_for(coroutine, 30))
+        finally:
+            loop.close()
+
+    async def start_server(self):
+        session_server = server.SessionServer(frame_rate=1000)
+        listening = await session_server.start("127.0.0.1", 0)
+        port = listening.sockets[0].getsockname()[1]
+        return session_server, port
+
+    def expected_frame(self, frames):
+        chip_emulator = emulator.Emulator(packed_screen=True)
+        chip_emulator.load_rom(library.read_rom(headless.resolve_rom("MAZE")))
+        chip_emulator.seed(1)
+        for _ in range(frames):
+            chip_emulator.run_cycles(chip_emulator.cycles_per_timer_tick)
+        return chip_emulator.screen.to_packed_bytes()
+
+    def test_client__receives_same_frames_as_local_emulator(self):
+        async def scenario():
+            session_server, port = await self.start_server()
+            client = await server.Client.connect("127.0.0.1", port)
+            client.load("MAZE", seed=1)
+            for _ in range(5):
+                self.assertTrue(await client.read_frame())
+            await client.close()
+            await session_server.close()
+            return client.frame_number, client.frame
+
+        frame_number, frame = self.run_async(scenario())
+        self.assertEqual(self.expected_frame(frame_number), frame)
+
+    def test_send_key__acknowledged_by_frame(self):
+        async def scenario():
+            session_server, port = await self.start_server()
+            client = await server.Client.connect("127.0.0.1", port)
+            client.load("MAZE", seed=1)
+            await client.read_frame()
+            client.send_key(5, True)
+            while not client.latencies:
+                await client.read_frame()
+            await client.close()
+            await session_server.close()
+            return client.latencies
+
+        self.assertEqual(1, len(self.run_async(scenario())))
+
+    def test_load__unknown_rom(self):
+        async def scenario():
+            session_server, port = await self.start_server()
+            client = await server.Client.connect("127.0.0.1", port)
+            client.load("NO SUCH GAME")
+            try:
+                with self.assertRaises(server.IncorrectMessageException):
+                    await client.read_frame()
+            finally:
+                await client.close()
+                await session_server.close()
+
+        self.run_async(scenario())
+
+    def broken_rom(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, "BROKEN")
+        with open(path, "wb") as f:
+            f.write(b"\xff\xff")
+        return path
+
+    def test_run_sessions__broken_rom__session_closed(self):
+        path = self.broken_rom()
+
+        async def scenario():
+            session_server, port = await self.start_server()
+            client = await server.Client.connect("127.0.0.1", port)
+            client.load(path)
+            try:
+                with self.assertRaises(server.IncorrectMessageException):
+                    await client.read_frame()
+                self.assertFalse(await client.read_frame())
+            finally:
+                await client.close()
+                await session_server.close()
+
+        self.run_async(scenario())
+
+    def test_run_load_test__broken_rom__errors_reported(self):
+        path = self.broken_rom()
+
+        async def scenario():
+            session_server, port = await self.start_server()
+            try:
+                return await server.run_load_test(
+                    3, 0.3, path, key_interval=0.05, host="127.0.0.1", port=port)
+            finally:
+                await session_server.close()
+
+        result = self.run_async(scenario())
+        self.assertEqual(3, result["failed_sessions"])
+        self.assertIn("ImpossibleOperationException", result["errors"][0])
+
+    def test_run_load_test__reports_latency(self):
+        async def scenario():
+            session_server, port = await self.start_server()
+            try:
+                return await server.run_load_test(
+                    4, 0.5, "BRIX", key_interval=0.05, host="127.0.0.1", port=port)
+            finally:
+                await session_server.close()
+
+        result = self.run_async(scenario())
+        self.assertEqual(4, result["sessions"])
+        self.assertGreater(result["frames"], 0)
+        self.assertGreater(result["latency_samples"], 0)
+        self.assertLessEqual(result["p50_latency"], result["max_latency"])
+
+
+if __name__ == '__main__':
+    unittest.main()
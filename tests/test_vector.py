@@ -0,0 +1,115 @@
+import random
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.path.pardir))
+
+import emulator
+import settings
+
+try:
+    import numpy as np
+    import vector
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class VectorEmulatorTest(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random()
+
+    def random_bytes(self, count):
+        return np.array([self.random.randint(0, 0xFF) for _ in range(count)])
+
+    def test_make_tact__same_state_as_emulator(self):
+        for game in ["BRIX", "INVADERS", "TETRIS", "BLINKY"]:
+            reference = emulator.Emulator()
+            reference.load_file_in_memory(settings.games_folder + game)
+            machines = vector.VectorEmulator(1, random_bytes=self.random_bytes)
+            machines.load_file_in_memory(settings.games_folder + game)
+
+            self.random.seed(game)
+            for i in range(2000):
+                machines.make_tact()
+                if i % 10 == 9:
+                    machines.degrease_timers_if_need()
+            reference.seed(game)
+            for i in range(2000):
+                reference.make_tact()
+                if i % 10 == 9:
+                    reference.degrease_timers_if_need()
+
+            self.assertEqual(bytes(reference.registers), machines.registers[0].tobytes())
+            self.assertEqual(bytes(reference.memory._memory), machines.memory[0].tobytes())
+            self.assertEqual(bytes(reference.screen._screen), machines.screen[0].tobytes())
+            self.assertEqual(reference.memory_pointer, machines.memory_pointer[0])
+            self.assertEqual(reference.register_i, machines.register_i[0])
+
+    def test_op_0xd__collision_per_machine(self):
+        machines = vector.VectorEmulator(3)
+        # draw "0" from font twice on machines 0 and 1, once on machine 2
+        program = bytes([0xa0, 0x00, 0xd0, 0x05, 0x30, 0x01, 0xd0, 0x05, 0x12, 0x08])
+        machines.load_data(program)
+        machines.registers[:2, 0] = 0
+        machines.registers[2, 0] = 1
+        machines.run(4)
+
+        self.assertEqual([1, 1, 0], list(machines.registers[:, 0xF]))
+        self.assertEqual(0, machines.screen[0].sum())
+        self.assertEqual(14, machines.screen[2].sum())
+
+    def test_make_tact__unknown_opcode__stop_only_this_machine(self):
+        machines = vector.VectorEmulator(2)
+        machines.load_data(bytes([0x50, 0x01]), [0])
+        machines.load_data(bytes([0x60, 0x07]), [1])
+        machines.make_tact()
+
+        self.assertEqual([True, False], list(machines.is_failed))
+        self.assertEqual(7, machines.registers[1, 0])
+
+    def test_run__delay_timer_polling__same_state_as_emulator(self):
+        # 200: LD V0, 0A; LD DT, V0; LD V1, DT; SE V1, 00; JP 204; ADD V2, 01; JP 200
+        program = bytes([0x60, 0x0A, 0xF0, 0x15, 0xF1, 0x07, 0x31, 0x00,
+                         0x12, 0x04, 0x72, 0x01, 0x12, 0x00])
+        reference = emulator.Emulator(cycles_per_timer_tick=7)
+        reference.load_rom(program)
+        machines = vector.VectorEmulator(2, cycles_per_timer_tick=7)
+        machines.load_data(program)
+
+        reference.run_cycles(1000)
+        machines.run(1000)
+
+        for machine in range(2):
+            self.assertEqual(bytes(reference.registers), machines.registers[machine].tobytes())
+            self.assertEqual(reference.memory_pointer, machines.memory_pointer[machine])
+            self.assertEqual(reference.delay_timer, machines.delay_timer[machine])
+        self.assertGreater(reference.registers[2], 5)
+
+    def test_press_release__tap_seen_as_by_emulator(self):
+        # 200: LD V0, 5; SKNP V0; ADD V1, 1; LD V2, K; JP 208
+        program = bytes([0x60, 0x05, 0xE0, 0xA1, 0x71, 0x01, 0xF2, 0x0A, 0x12, 0x08])
+        reference = emulator.Emulator()
+        reference.load_rom(program)
+        reference.press_button(0x5)
+        reference.release_button(0x5)
+        machines = vector.VectorEmulator(2)
+        machines.load_data(program)
+        machines.press_button(0x5, [0])
+        machines.release_button(0x5, [0])
+
+        for _ in range(5):
+            reference.make_tact()
+            machines.make_tact()
+
+        self.assertEqual(bytes(reference.registers), machines.registers[0].tobytes())
+        self.assertEqual(reference.memory_pointer, machines.memory_pointer[0])
+        self.assertEqual([0, 0], list(machines.keys))
+        self.assertEqual(0, machines.registers[1, 1])
+        self.assertTrue(machines.is_waiting_mode[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
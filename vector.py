@@ -0,0 +1,431 @@
+import numpy as np
+
+import emulator
+import memory
+import screen
+import settings
+
+
+class VectorEmulator:
+    def __init__(self, count, seed=None, random_bytes=None, stack_size=16,
+                 cycles_per_timer_tick=settings.instructions_per_frame):
+        self.count = count
+        # timers of every machine are decreased once per cycles_per_timer_tick
+        # executed instructions, as in Emulator.run_cycles
+        self.cycles_per_timer_tick = cycles_per_timer_tick
+        self.memory_size = memory.Memory().memory_size
+        chip_screen = screen.Screen()
+        self.height = chip_screen.height
+        self.width = chip_screen.width
+        self.stack_size = stack_size
+
+        self.memory = np.zeros((count, self.memory_size), dtype=np.uint8)
+        self.registers = np.zeros((count, 16), dtype=np.uint8)
+        self.screen = np.zeros((count, self.height, self.width), dtype=np.uint8)
+        self.stack = np.zeros((count, stack_size), dtype=np.int32)
+        self.stack_pointer = np.zeros(count, dtype=np.int32)
+        self.memory_pointer = np.zeros(count, dtype=np.int32)
+        self.register_i = np.zeros(count, dtype=np.int32)
+        self.delay_timer = np.zeros(count, dtype=np.int32)
+        self.sound_timer = np.zeros(count, dtype=np.int32)
+        self.cycles = np.zeros(count, dtype=np.int64)
+        self._next_timer_cycle = np.zeros(count, dtype=np.int64)
+        self.is_waiting_mode = np.zeros(count, dtype=bool)
+        # keypad of every machine as in keypad.Keypad: bit k is set while key k
+        # is held, taps not seen by EX9E/EXA1/FX0A are latched, the last pressed
+        # key (-1 if none) is consumed by FX0A
+        self.keys = np.zeros(count, dtype=np.int32)
+        self.latched = np.zeros(count, dtype=np.int32)
+        self._unobserved = np.zeros(count, dtype=np.int32)
+        self.last_pressed = np.full(count, -1, dtype=np.int32)
+        # machines stopped by impossible operation
+        self.is_failed = np.zeros(count, dtype=bool)
+
+        self._font = np.array(emulator.Emulator.font, dtype=np.uint8)
+        self._generator = np.random.default_rng(seed)
+        self._random_bytes = random_bytes or self._generate_random_bytes
+        self._rows = np.arange(count)
+
+        self.instructions = {
+            0x0: self._op_0x0,
+            0x00E0: self._op_0x00e0,
+            0x00EE: self._op_0x00ee,
+            0x1: self._op_0x1,
+            0x2: self._op_0x2,
+            0x3: self._op_0x3,
+            0x4: self._op_0x4,
+            0x5000: self._op_0x5__0,
+            0x6: self._op_0x6,
+            0x7: self._op_0x7,
+            0x8000: self._op_0x8__0,
+            0x8001: self._op_0x8__1,
+            0x8002: self._op_0x8__2,
+            0x8003: self._op_0x8__3,
+            0x8004: self._op_0x8__4,
+            0x8005: self._op_0x8__5,
+            0x8006: self._op_0x8__6,
+            0x8007: self._op_0x8__7,
+            0x800e: self._op_0x8__e,
+            0x9000: self._op_0x9__0,
+            0xA: self._op_0xa,
+            0xB: self._op_0xb,
+            0xC: self._op_0xc,
+            0xD: self._op_0xd,
+            0xE09E: self._op_0xe_9e,
+            0xE0A1: self._op_0xe_a1,
+            0xF007: self._op_0xf_07,
+            0xF00A: self._op_0xf_0a,
+            0xF015: self._op_0xf_15,
+            0xF018: self._op_0xf_18,
+            0xF01E: self._op_0xf_1e,
+            0xF029: self._op_0xf_29,
+            0xF033: self._op_0xf_33,
+            0xF055: self._op_0xf_55,
+            0xF065: self._op_0xf_65
+        }
+
+        self.reset()
+
+    def _generate_random_bytes(self, count):
+        return self._generator.integers(0, 0x100, count, dtype=np.int32)
+
+    def reset(self, machines=None):
+        if machines is None:
+            machines = self._rows
+        self.memory[machines] = 0
+        self.memory[machines, :len(self._font)] = self._font
+        self.registers[machines] = 0
+        self.screen[machines] = 0
+        self.stack[machines] = 0
+        self.stack_pointer[machines] = 0
+        self.memory_pointer[machines] = 0x200
+        self.register_i[machines] = 0x200
+        self.delay_timer[machines] = 0
+        self.sound_timer[machines] = 0
+        self.cycles[machines] = 0
+        self._next_timer_cycle[machines] = self.cycles_per_timer_tick
+        self.is_waiting_mode[machines] = False
+        self.keys[machines] = 0
+        self.latched[machines] = 0
+        self._unobserved[machines] = 0
+        self.last_pressed[machines] = -1
+        self.is_failed[machines] = False
+
+    def press_button(self, key, machines=None):
+        if machines is None:
+            machines = self._rows
+        self.keys[machines] |= 1 << key
+        self._unobserved[machines] |= 1 << key
+        self.last_pressed[machines] = key
+
+    def release_button(self, key, machines=None):
+        if machines is None:
+            machines = self._rows
+        machines = self._rows[machines]
+        bit = 1 << key
+        is_unobserved = (self._unobserved[machines] & bit) != 0
+        self.keys[machines] &= ~bit
+        self.latched[machines[is_unobserved]] |= bit
+        is_forgotten = ~is_unobserved & (self.last_pressed[machines] == key)
+        self.last_pressed[machines[is_forgotten]] = -1
+
+    def _observe_keys(self, rows, keys):
+        # pressed state of keys, which are then not latched anymore
+        bits = np.where(keys < 16, np.left_shift(1, keys.astype(np.int32) & 0xF), 0)
+        is_pressed = ((self.keys[rows] | self.latched[rows]) & bits) != 0
+        self._unobserved[rows] &= ~bits
+        self.latched[rows] &= ~bits
+        return is_pressed
+
+    def load_data(self, data, machines=None):
+        if machines is None:
+            machines = self._rows
+        if 0x200 + len(data) > self.memory_size:
+            raise memory.MemoryOverflowException()
+        self.memory[machines, 0x200:0x200 + len(data)] = np.frombuffer(bytes(data), dtype=np.uint8)
+
+    def load_file_in_memory(self, file_name, machines=None):
+        try:
+            with open(file_name, 'rb') as f:
+                data = f.read()
+        except Exception:
+            raise BlockingIOError("Can't read a file {}".format(file_name))
+        self.load_data(data, machines)
+
+    def degrease_timers_if_need(self, machines=None):
+        if machines is None:
+            machines = self._rows
+        for timer in (self.delay_timer, self.sound_timer):
+            rows = machines[timer[machines] > 0]
+            timer[rows] -= 1
+
+    def advance_cycles(self, machines):
+        self.cycles[machines] += 1
+        rows = machines[self.cycles[machines] >= self._next_timer_cycle[machines]]
+        if len(rows):
+            self.degrease_timers_if_need(rows)
+            self._next_timer_cycle[rows] += self.cycles_per_timer_tick
+
+    def decode(self, machines):
+        pointers = self.memory_pointer[machines]
+        words = (self.memory[machines, pointers].astype(np.int32) << 8) | \
+            self.memory[machines, pointers + 1]
+        high = words >> 12
+
+        # the same opcodes as Emulator.parse_word gives
+        opcodes = high.copy()
+        is_flow = (words == 0x00E0) | (words == 0x00EE)
+        opcodes[is_flow] = words[is_flow]
+        is_pair = (high == 0x8) | (high == 0x5) | (high == 0x9)
+        opcodes[is_pair] = words[is_pair] & 0xF00F
+        is_single = high >= 0xE
+        opcodes[is_single] = words[is_single] & 0xF0FF
+        return opcodes, words
+
+    def make_tact(self):
+        self.is_failed |= self.memory_pointer >= self.memory_size - 1
+        machines = self._rows[~self.is_failed]
+        if len(machines) == 0:
+            return
+
+        opcodes, words = self.decode(machines)
+        order = np.argsort(opcodes, kind='stable')
+        sorted_opcodes = opcodes[order]
+        bounds = np.flatnonzero(np.diff(sorted_opcodes)) + 1
+
+        for group in np.split(order, bounds):
+            opcode = int(opcodes[group[0]])
+            rows = machines[group]
+            handler = self.instructions.get(opcode)
+            if handler is None:
+                self.is_failed[rows] = True
+                continue
+            group_words = words[group]
+            handler(rows, (group_words >> 8) & 0xF, (group_words >> 4) & 0xF,
+                    group_words & 0xF, group_words & 0xFF, group_words & 0xFFF)
+
+    def run(self, cycles):
+        for _ in range(cycles):
+            self.make_tact()
+            # a machine failed by this instruction doesn't count it, as Emulator
+            self.advance_cycles(self._rows[~self.is_failed])
+
+    def _fail(self, rows, is_failed):
+        self.is_failed[rows[is_failed]] = True
+        return rows[~is_failed]
+
+    def _next(self, rows, is_skip=None):
+        if is_skip is None:
+            self.memory_pointer[rows] += 0x2
+        else:
+            self.memory_pointer[rows] += np.where(is_skip, 0x4, 0x2)
+
+    def _op_0x0(self, rows, x, y, n, nn, nnn):
+        self._next(rows)
+
+    def _op_0x00e0(self, rows, x, y, n, nn, nnn):
+        self.screen[rows] = 0
+        self._next(rows)
+
+    def _op_0x00ee(self, rows, x, y, n, nn, nnn):
+        rows = self._fail(rows, self.stack_pointer[rows] == 0)
+        self.stack_pointer[rows] -= 1
+        self.memory_pointer[rows] = self.stack[rows, self.stack_pointer[rows]]
+
+    def _op_0x1(self, rows, x, y, n, nn, nnn):
+        self.memory_pointer[rows] = nnn
+
+    def _op_0x2(self, rows, x, y, n, nn, nnn):
+        is_failed = self.stack_pointer[rows] >= self.stack_size
+        nnn = nnn[~is_failed]
+        rows = self._fail(rows, is_failed)
+        self.stack[rows, self.stack_pointer[rows]] = self.memory_pointer[rows] + 0x2
+        self.stack_pointer[rows] += 1
+        self.memory_pointer[rows] = nnn
+
+    def _op_0x3(self, rows, x, y, n, nn, nnn):
+        self._next(rows, self.registers[rows, x] == nn)
+
+    def _op_0x4(self, rows, x, y, n, nn, nnn):
+        self._next(rows, self.registers[rows, x] != nn)
+
+    def _op_0x5__0(self, rows, x, y, n, nn, nnn):
+        self._next(rows, self.registers[rows, x] == self.registers[rows, y])
+
+    def _op_0x6(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] = nn
+        self._next(rows)
+
+    def _op_0x7(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] = (self.registers[rows, x] + nn) & 0xFF
+        self._next(rows)
+
+    def _op_0x8__0(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] = self.registers[rows, y]
+        self._next(rows)
+
+    def _op_0x8__1(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] |= self.registers[rows, y]
+        self._next(rows)
+
+    def _op_0x8__2(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] &= self.registers[rows, y]
+        self._next(rows)
+
+    def _op_0x8__3(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] ^= self.registers[rows, y]
+        self._next(rows)
+
+    def _op_0x8__4(self, rows, x, y, n, nn, nnn):
+        value = self.registers[rows, x].astype(np.int32) + self.registers[rows, y]
+        self.registers[rows, 0xF] = value >> 8
+        self.registers[rows, x] = value & 0xFF
+        self._next(rows)
+
+    def _op_0x8__5(self, rows, x, y, n, nn, nnn):
+        value = self.registers[rows, x].astype(np.int32) - self.registers[rows, y]
+        self.registers[rows, 0xF] = value >= 0
+        self.registers[rows, x] = value & 0xFF
+        self._next(rows)
+
+    def _op_0x8__6(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, 0xF] = self.registers[rows, x] & 0b1
+        self.registers[rows, x] = self.registers[rows, x] >> 1
+        self._next(rows)
+
+    def _op_0x8__7(self, rows, x, y, n, nn, nnn):
+        value = self.registers[rows, y].astype(np.int32) - self.registers[rows, x]
+        self.registers[rows, x] = value & 0xFF
+        self.registers[rows, 0xF] = value >= 0
+        self._next(rows)
+
+    def _op_0x8__e(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, 0xF] = (self.registers[rows, x] & 0x80) >> 7
+        self.registers[rows, x] = (self.registers[rows, x].astype(np.int32) << 1) & 0xFF
+        self._next(rows)
+
+    def _op_0x9__0(self, rows, x, y, n, nn, nnn):
+        self._next(rows, self.registers[rows, x] != self.registers[rows, y])
+
+    def _op_0xa(self, rows, x, y, n, nn, nnn):
+        self.register_i[rows] = nnn
+        self._next(rows)
+
+    def _op_0xb(self, rows, x, y, n, nn, nnn):
+        value = nnn + self.registers[rows, 0]
+        is_failed = value > self.memory_size
+        rows = self._fail(rows, is_failed)
+        self.memory_pointer[rows] = value[~is_failed]
+
+    def _op_0xc(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] = self._random_bytes(len(rows)) & nn
+        self._next(rows)
+
+    def _op_0xd(self, rows, x, y, n, nn, nnn):
+        start_x = self.registers[rows, x].astype(np.int32)
+        start_y = self.registers[rows, y].astype(np.int32)
+        start_i = self.register_i[rows]
+
+        # Memory.read rejects the last byte of memory
+        is_failed = start_i + n >= self.memory_size
+        keep = ~is_failed
+        rows = self._fail(rows, is_failed)
+        start_x, start_y, start_i, n = start_x[keep], start_y[keep], start_i[keep], n[keep]
+        collision = np.zeros(len(rows), dtype=bool)
+
+        offsets = np.arange(8)
+        for row in range(int(n.max()) if len(n) else 0):
+            is_active = row < n
+            data = self.memory[rows, np.minimum(start_i + row, self.memory_size - 1)]
+            pixels = np.unpackbits(data[:, None], axis=1)
+            screen_x = start_x[:, None] + offsets
+            screen_y = np.broadcast_to((start_y + row)[:, None], screen_x.shape)
+            is_visible = (screen_x < self.width) & (screen_y < self.height) & \
+                is_active[:, None] & (pixels == 1)
+
+            machine_index, bit_index = np.nonzero(is_visible)
+            target = (rows[machine_index], screen_y[machine_index, bit_index],
+                      screen_x[machine_index, bit_index])
+            collision[machine_index[self.screen[target] == 1]] = True
+            self.screen[target] ^= 1
+
+        self.registers[rows, 0xF] = collision
+        self._next(rows)
+
+    def _op_0xe_9e(self, rows, x, y, n, nn, nnn):
+        self._next(rows, self._observe_keys(rows, self.registers[rows, x]))
+
+    def _op_0xe_a1(self, rows, x, y, n, nn, nnn):
+        self._next(rows, ~self._observe_keys(rows, self.registers[rows, x]))
+
+    def _op_0xf_07(self, rows, x, y, n, nn, nnn):
+        self.registers[rows, x] = self.delay_timer[rows]
+        self._next(rows)
+
+    def _op_0xf_0a(self, rows, x, y, n, nn, nnn):
+        is_waiting = self.last_pressed[rows] < 0
+        self.is_waiting_mode[rows] = is_waiting
+        rows, x = rows[~is_waiting], x[~is_waiting]
+        keys = self.last_pressed[rows]
+        self.registers[rows, x] = keys
+        self._observe_keys(rows, keys)
+        self.last_pressed[rows] = -1
+        self._next(rows)
+
+    def _op_0xf_15(self, rows, x, y, n, nn, nnn):
+        self.delay_timer[rows] = self.registers[rows, x]
+        self._next(rows)
+
+    def _op_0xf_18(self, rows, x, y, n, nn, nnn):
+        self.sound_timer[rows] = self.registers[rows, x]
+        self._next(rows)
+
+    def _op_0xf_1e(self, rows, x, y, n, nn, nnn):
+        value = self.register_i[rows] + self.registers[rows, x]
+        self.register_i[rows] = value % self.memory_size
+        self.registers[rows, 0xF] = value // self.memory_size
+        self._next(rows)
+
+    def _op_0xf_29(self, rows, x, y, n, nn, nnn):
+        self.register_i[rows] = self.registers[rows, x].astype(np.int32) * 5
+        self._next(rows)
+
+    def _op_0xf_33(self, rows, x, y, n, nn, nnn):
+        start_i = self.register_i[rows]
+        is_failed = start_i + 2 >= self.memory_size
+        keep = ~is_failed
+        rows, x, start_i = self._fail(rows, is_failed), x[keep], start_i[keep]
+
+        value = self.registers[rows, x]
+        self.memory[rows, start_i] = value // 100
+        self.memory[rows, start_i + 1] = (value // 10) % 10
+        self.memory[rows, start_i + 2] = value % 10
+        self._next(rows)
+
+    def _op_0xf_55(self, rows, x, y, n, nn, nnn):
+        start_i = self.register_i[rows]
+        is_failed = start_i + x >= self.memory_size
+        keep = ~is_failed
+        rows, x, start_i = self._fail(rows, is_failed), x[keep], start_i[keep]
+
+        for register in range(16):
+            is_copied = register <= x
+            if not is_copied.any():
+                break
+            copied = rows[is_copied]
+            self.memory[copied, start_i[is_copied] + register] = self.registers[copied, register]
+        self._next(rows)
+
+    def _op_0xf_65(self, rows, x, y, n, nn, nnn):
+        start_i = self.register_i[rows]
+        is_failed = start_i + x + 1 >= self.memory_size
+        keep = ~is_failed
+        rows, x, start_i = self._fail(rows, is_failed), x[keep], start_i[keep]
+
+        for register in range(16):
+            is_copied = register <= x
+            if not is_copied.any():
+                break
+            copied = rows[is_copied]
+            self.registers[copied, register] = self.memory[copied, start_i[is_copied] + register]
+        self._next(rows)